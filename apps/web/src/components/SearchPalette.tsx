@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { Calendar, CornerDownRight, FileText, Folder } from 'lucide-react';
 import {
   CommandDialog,
@@ -18,6 +18,8 @@ export function SearchPalette() {
   const { setActiveNote, notes } = useNotesStore();
   const [query, setQuery] = useState('');
   const [results, setResults] = useState<SearchResult[]>([]);
+  // Lets the server cancel our previous search when a newer one arrives
+  const clientId = useRef(crypto.randomUUID());
 
   // Search on query change
   useEffect(() => {
@@ -25,15 +27,22 @@ export function SearchPalette() {
       setResults([]);
       return;
     }
+    const controller = new AbortController();
     const timer = setTimeout(async () => {
       try {
-        const data = await searchApi.search(query);
+        const data = await searchApi.search(query, 20, 'word', {
+          client: clientId.current,
+          signal: controller.signal,
+        });
         setResults(data);
       } catch {
-        setResults([]);
+        if (!controller.signal.aborted) setResults([]);
       }
     }, 200);
-    return () => clearTimeout(timer);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
   }, [query]);
 
   const recentNotes = query.trim()
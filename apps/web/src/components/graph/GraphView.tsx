@@ -19,6 +19,9 @@ const EDGE_STYLES: Record<string, { stroke: string; strokeDasharray?: string }>
   folder: { stroke: '#64748b', strokeDasharray: '2 4' },
 };
 
+// Pixels per unit of the server layout, whose ideal edge length is 1
+const LAYOUT_SCALE = 200;
+
 export function GraphView() {
   const [nodes, setNodes, onNodesChange] = useNodesState([]);
   const [edges, setEdges, onEdgesChange] = useEdgesState([]);
@@ -30,19 +33,22 @@ export function GraphView() {
 
   useEffect(() => {
     graphApi
-      .get()
+      .get({ mode: 'groups' })
       .then((data) => {
-        // Layout: simple grid
+        // Layout: server-computed positions, grid for nodes added since
         const cols = Math.ceil(Math.sqrt(data.nodes.length));
         const gapX = 220;
         const gapY = 80;
 
         const flowNodes: Node[] = data.nodes.map((n, i) => ({
           id: n.id,
-          position: { x: (i % cols) * gapX, y: Math.floor(i / cols) * gapY },
-          data: { label: n.title || 'Untitled' },
+          position:
+            n.x !== null && n.y !== null
+              ? { x: n.x * LAYOUT_SCALE, y: n.y * LAYOUT_SCALE }
+              : { x: (i % cols) * gapX, y: Math.floor(i / cols) * gapY },
+          data: { label: n.title || 'Untitled', kind: n.kind },
           style: {
-            background: isDark ? '#1E293B' : '#ffffff',
+            background: n.kind !== 'note' ? (isDark ? '#334155' : '#F1F5F9') : isDark ? '#1E293B' : '#ffffff',
             color: isDark ? '#F1F5F9' : '#202124',
             border: `1px solid ${isDark ? '#334155' : '#DADCE0'}`,
             borderRadius: '8px',
@@ -70,6 +76,7 @@ export function GraphView() {
 
   const onNodeClick = useCallback(
     (_: React.MouseEvent, node: Node) => {
+      if (node.data.kind !== 'note') return;
       setActiveNote(node.id);
       setView('all');
     },
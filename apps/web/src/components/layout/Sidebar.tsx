@@ -36,7 +36,7 @@ import { useTagsStore } from '@/stores/tags-store';
 import { useNotesStore } from '@/stores/notes-store';
 import { useProjectsStore } from '@/stores/projects-store';
 import { useUIStore } from '@/stores/ui-store';
-import { foldersApi } from '@/lib/api';
+import { foldersApi, sidebarApi } from '@/lib/api';
 import type { FolderTree } from '@/lib/api';
 
 const TAG_COLORS = ['#6366f1', '#f59e0b', '#10b981', '#ef4444', '#8b5cf6', '#ec4899', '#06b6d4', '#f97316'];
@@ -493,9 +493,9 @@ function ProjectItem({ project }: { project: { id: string; name: string; icon?:
 
 export function Sidebar() {
   const { tree, fetchTree } = useFoldersStore();
-  const { tags, fetchTags, setActiveTag, createTag } = useTagsStore();
+  const { tags, setActiveTag, createTag } = useTagsStore();
   const { fetchNotes, setActiveNote } = useNotesStore();
-  const { projects, fetchProjects, createProject } = useProjectsStore();
+  const { projects, createProject } = useProjectsStore();
   const { theme, toggleTheme, setView, setSearchOpen, setMobileSidebarOpen, view } = useUIStore();
   const setActiveFolder = useFoldersStore((s) => s.setActiveFolder);
 
@@ -517,10 +517,21 @@ export function Sidebar() {
   }, []);
 
   useEffect(() => {
-    fetchTree();
-    fetchTags();
-    fetchProjects();
-  }, [fetchTree, fetchTags, fetchProjects]);
+    // One request for folders, tags and projects instead of three
+    sidebarApi
+      .get()
+      .then((snapshot) => {
+        useFoldersStore.getState().setTree(snapshot.folders);
+        useTagsStore.setState({ tags: snapshot.tags.filter((t) => t.project_id === null) });
+        useProjectsStore.setState({ projects: snapshot.projects });
+      })
+      .catch(() => {
+        // Fall back to loading each section on its own
+        useFoldersStore.getState().fetchTree().catch(() => {});
+        useTagsStore.getState().fetchTags().catch(() => {});
+        useProjectsStore.getState().fetchProjects().catch(() => {});
+      });
+  }, []);
 
   const handleCreateFolder = async () => {
     if (!newFolderName.trim()) return;
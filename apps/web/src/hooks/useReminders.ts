@@ -1,43 +1,58 @@
 import { useCallback, useEffect, useRef, useState } from 'react';
-import { remindersApi } from '@/lib/api';
-import type { ReminderWithNote } from '@/lib/api';
+import { openEventStream, remindersApi } from '@/lib/api';
+import type { ReminderWithNote, ScheduledSummaryFired } from '@/lib/api';
+
+interface ChangeEvent {
+  changes: { entity: string; id: string; op: 'upsert' | 'delete' }[];
+}
 
 export function useReminders() {
   const [pending, setPending] = useState<ReminderWithNote[]>([]);
   const [fired, setFired] = useState<ReminderWithNote[]>([]);
+  const firedIds = useRef(new Set<string>());
 
   const fetchPending = useCallback(async () => {
     try {
       const data = await remindersApi.pending();
       setPending(data);
     } catch {
-      // Silently fail — polling will retry
+      // Silently fail — the next change event will retry
     }
   }, []);
 
-  const checkSummaries = useCallback(async () => {
-    try {
-      const summaries = await remindersApi.summaries();
-      for (const s of summaries) {
-        if (Notification.permission === 'granted') {
-          new Notification(s.name, { body: s.message, tag: `summary-${s.id}` });
-        }
+  // The server pushes due reminders and summaries over SSE; no polling needed.
+  // EventSource reconnects on its own, and we resync pending on every (re)connect.
+  useEffect(() => {
+    const source = openEventStream();
+
+    source.onopen = () => {
+      fetchPending();
+    };
+
+    source.addEventListener('reminder', (e) => {
+      const reminder: ReminderWithNote = JSON.parse((e as MessageEvent).data);
+      // Always produce a new array so the due-check effect below re-runs
+      setPending((prev) => [...prev.filter((r) => r.id !== reminder.id), reminder]);
+    });
+
+    source.addEventListener('summary', (e) => {
+      const s: ScheduledSummaryFired = JSON.parse((e as MessageEvent).data);
+      if (Notification.permission === 'granted') {
+        new Notification(s.name, { body: s.message, tag: `summary-${s.id}` });
       }
-    } catch {
-      // Silently fail
-    }
-  }, []);
+    });
 
-  // Poll every 30 seconds
-  useEffect(() => {
-    fetchPending();
-    checkSummaries();
-    const interval = setInterval(() => {
+    source.addEventListener('change', (e) => {
+      const { changes }: ChangeEvent = JSON.parse((e as MessageEvent).data);
+      if (changes.some((c) => c.entity === 'reminders')) fetchPending();
+    });
+
+    source.addEventListener('resync', () => {
       fetchPending();
-      checkSummaries();
-    }, 30_000);
-    return () => clearInterval(interval);
-  }, [fetchPending, checkSummaries]);
+    });
+
+    return () => source.close();
+  }, [fetchPending]);
 
   // Check for due reminders and fire them
   useEffect(() => {
@@ -46,6 +61,11 @@ export function useReminders() {
     if (due.length === 0) return;
 
     for (const reminder of due) {
+      // Snoozing moves remind_at, so key on both to allow a second firing
+      const key = `${reminder.id}@${reminder.remind_at}`;
+      if (firedIds.current.has(key)) continue;
+      firedIds.current.add(key);
+
       // Show browser notification
       if (Notification.permission === 'granted') {
         const n = new Notification('Every Note Reminder', {
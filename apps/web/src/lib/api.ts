@@ -9,11 +9,19 @@ import type {
   FolderTree,
   TagResponse,
   ProjectResponse,
+  SidebarSnapshot,
   SearchResult,
+  SearchPage,
   NoteVersionBrief,
   NoteVersionResponse,
   BacklinkResponse,
+  DuplicateCluster,
+  RelatedNote,
+  TitleMatch,
+  GraphColumns,
   GraphData,
+  GraphDiff,
+  GraphEdge,
   SpendingCategoryResponse,
   SpendingEntryResponse,
   IncomeEntryResponse,
@@ -35,13 +43,22 @@ export type {
   FolderTree,
   TagResponse,
   ProjectResponse,
+  SidebarSnapshot,
   SearchResult,
+  SearchFacet,
+  SearchFacets,
+  SearchPage,
   NoteVersionBrief,
   NoteVersionResponse,
   BacklinkResponse,
+  DuplicateCluster,
+  RelatedNote,
+  TitleMatch,
   GraphNode,
   GraphEdge,
   GraphData,
+  GraphDiff,
+  GraphColumns,
   SpendingCategoryResponse,
   SpendingEntryResponse,
   IncomeEntryResponse,
@@ -123,6 +140,15 @@ export const notesApi = {
   backlinks(noteId: string) {
     return request<BacklinkResponse[]>(`/notes/${noteId}/backlinks`);
   },
+  related(noteId: string, limit = 10) {
+    return request<RelatedNote[]>(`/notes/${noteId}/related?limit=${limit}`);
+  },
+  duplicates(threshold = 0.8) {
+    return request<DuplicateCluster[]>(`/notes/duplicates?threshold=${threshold}`);
+  },
+  completeTitles(prefix: string, limit = 10) {
+    return request<TitleMatch[]>(`/notes/titles/complete?prefix=${encodeURIComponent(prefix)}&limit=${limit}`);
+  },
   removeRecurrence(id: string) {
     return request<NoteResponse>(`/notes/${id}/recurrence`, { method: 'DELETE' });
   },
@@ -187,6 +213,12 @@ export const remindersApi = {
   },
 };
 
+// --- Events (server-sent) ---
+
+export function openEventStream() {
+  return new EventSource(`${BASE}/events`);
+}
+
 // --- Folders ---
 
 export const foldersApi = {
@@ -214,6 +246,14 @@ export const foldersApi = {
   },
 };
 
+// --- Sidebar ---
+
+export const sidebarApi = {
+  get() {
+    return request<SidebarSnapshot>('/sidebar');
+  },
+};
+
 // --- Tags ---
 
 export const tagsApi = {
@@ -254,8 +294,23 @@ export const projectsApi = {
 // --- Search ---
 
 export const searchApi = {
-  search(q: string, limit = 20) {
-    return request<SearchResult[]>(`/search?q=${encodeURIComponent(q)}&limit=${limit}`);
+  search(
+    q: string,
+    limit = 20,
+    mode: 'word' | 'substring' | 'fuzzy' = 'word',
+    opts: { client?: string; signal?: AbortSignal } = {},
+  ) {
+    const client = opts.client ? `&client=${encodeURIComponent(opts.client)}` : '';
+    return request<SearchResult[]>(`/search?q=${encodeURIComponent(q)}&limit=${limit}&mode=${mode}${client}`, {
+      signal: opts.signal,
+    });
+  },
+
+  page(q: string, opts: { limit?: number; mode?: 'word' | 'substring' | 'fuzzy'; cursor?: string; facets?: boolean } = {}) {
+    const params = new URLSearchParams({ q, limit: String(opts.limit ?? 20), mode: opts.mode ?? 'word', paged: 'true' });
+    if (opts.cursor) params.set('cursor', opts.cursor);
+    if (opts.facets) params.set('facets', 'true');
+    return request<SearchPage>(`/search?${params}`);
   },
 };
 
@@ -284,9 +339,65 @@ export const exportApi = {
 
 // --- Graph ---
 
+const GRAPH_MEDIA_TYPE = 'application/vnd.every-note.graph';
+
+function decodeGraph(buffer: ArrayBuffer): GraphColumns {
+  const view = new DataView(buffer);
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+  if (magic !== 'ENG1') throw new Error('Unknown graph encoding');
+  const edgeCount = view.getUint32(8, true);
+  const tableLength = view.getUint32(12, true);
+  const version = Number(view.getBigInt64(16, true));
+  const table = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 24, tableLength)));
+  const offset = 24 + tableLength;
+  // Arrays are little-endian on the wire, which every browser platform is too
+  return {
+    version: version < 0 ? null : version,
+    ids: table.ids,
+    titles: table.titles,
+    folderIds: table.folder_ids,
+    kinds: table.kinds,
+    x: table.x,
+    y: table.y,
+    pagerank: table.pagerank,
+    component: table.component,
+    layoutVersion: table.layout_version,
+    edgeTypes: table.edge_types,
+    sources: new Uint32Array(buffer, offset, edgeCount),
+    targets: new Uint32Array(buffer, offset + 4 * edgeCount, edgeCount),
+    types: new Uint8Array(buffer, offset + 8 * edgeCount, edgeCount),
+  };
+}
+
 export const graphApi = {
-  get() {
-    return request<GraphData>('/graph');
+  get(opts: { mode?: 'pairwise' | 'groups'; types?: GraphEdge['type'][] } = {}) {
+    const params = new URLSearchParams();
+    if (opts.mode) params.set('mode', opts.mode);
+    for (const type of opts.types ?? []) params.append('types', type);
+    const query = params.toString();
+    return request<GraphData>(`/graph${query ? `?${query}` : ''}`);
+  },
+  async getColumns(opts: { mode?: 'pairwise' | 'groups'; types?: GraphEdge['type'][] } = {}) {
+    const params = new URLSearchParams();
+    if (opts.mode) params.set('mode', opts.mode);
+    for (const type of opts.types ?? []) params.append('types', type);
+    const query = params.toString();
+    const res = await fetch(`${BASE}/graph${query ? `?${query}` : ''}`, { headers: { Accept: GRAPH_MEDIA_TYPE } });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    return decodeGraph(await res.arrayBuffer());
+  },
+  neighborhood(noteId: string, opts: { depth?: number; limit?: number; tags?: boolean } = {}) {
+    const params = new URLSearchParams();
+    if (opts.depth) params.set('depth', String(opts.depth));
+    if (opts.limit) params.set('limit', String(opts.limit));
+    if (opts.tags) params.set('tags', 'true');
+    const query = params.toString();
+    return request<GraphData>(`/graph/neighborhood/${noteId}${query ? `?${query}` : ''}`);
+  },
+  changes(since: number, types: GraphEdge['type'][] = []) {
+    const params = new URLSearchParams({ since: String(since) });
+    for (const type of types) params.append('types', type);
+    return request<GraphDiff>(`/graph/changes?${params}`);
   },
 };
 
@@ -21,6 +21,7 @@ interface FoldersState {
   loading: boolean;
 
   fetchTree: () => Promise<void>;
+  setTree: (tree: FolderTree[]) => void;
   setActiveFolder: (id: string | null) => void;
   createFolder: (data: { name: string; icon?: string | null; parent_id?: string | null }) => Promise<void>;
   updateFolder: (id: string, data: { name?: string; icon?: string | null }) => Promise<void>;
@@ -43,6 +44,8 @@ export const useFoldersStore = create<FoldersState>((set) => ({
     }
   },
 
+  setTree: (tree) => set({ tree, folderMap: flattenTree(tree) }),
+
   setActiveFolder: (id) => set({ activeFolderId: id }),
 
   createFolder: async (data) => {
@@ -0,0 +1,86 @@
+"""Read side of the trigger-maintained `sync_changes` log.
+
+Every write to notes, folders, tags, projects, note_tags and note_links moves
+the touched entity to the end of the log with a fresh, monotonically increasing
+`seq`. The latest seq doubles as a cheap database-wide change generation.
+
+Derived indexes (see app/related.py) follow the log from their own cursor in
+index_cursors, so they catch up incrementally and resume after a restart.
+"""
+import asyncio
+import logging
+from collections.abc import Callable
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.events import bus
+
+logger = logging.getLogger(__name__)
+
+INDEX_POLL_SECONDS = 300
+# Edits arrive per keystroke burst; wait for them to settle before reindexing
+INDEX_DEBOUNCE_SECONDS = 2
+
+
+@dataclass
+class Change:
+    seq: int
+    entity: str  # "note" | "folder" | "tag" | "project" | "note_tag" | "link"
+    entity_id: str  # composite keys are "<a>:<b>"
+    op: str  # "upsert" | "delete"
+
+
+def current_seq(session: Session) -> int:
+    """Return the seq of the most recent write (0 for an empty log)."""
+    return session.exec(text("SELECT COALESCE(MAX(seq), 0) FROM sync_changes")).one()[0]
+
+
+def changes_since(session: Session, since: int, limit: int) -> list[Change]:
+    """Return up to `limit` changes with seq > since, oldest first."""
+    rows = session.exec(
+        text(
+            "SELECT seq, entity, entity_id, op FROM sync_changes"
+            " WHERE seq > :since ORDER BY seq LIMIT :limit"
+        ).bindparams(since=since, limit=limit)
+    ).all()
+    return [Change(*row) for row in rows]
+
+
+def note_changes_after(session: Session, cursor: str, batch: int) -> tuple[list[str], Optional[int]]:
+    """Next batch for the named index: (changed note ids, seq to advance to), or ([], None) when caught up."""
+    row = session.exec(text("SELECT seq FROM index_cursors WHERE name = :name").bindparams(name=cursor)).first()
+    changes = changes_since(session, row[0] if row else 0, batch)
+    if not changes:
+        return [], None
+    return [c.entity_id for c in changes if c.entity == "note"], changes[-1].seq
+
+
+def advance_cursor(session: Session, cursor: str, seq: int) -> None:
+    session.exec(
+        text("INSERT OR REPLACE INTO index_cursors (name, seq) VALUES (:name, :seq)").bindparams(name=cursor, seq=seq)
+    )
+
+
+async def follow_notes(step: Callable[[], bool], label: str) -> None:
+    """Run `step` in a thread until it reports no more work, again shortly after notes change."""
+    changed = asyncio.Event()
+
+    def on_event(kind: str, data: Any) -> None:
+        if kind == "change" and any(c["entity"] == "notes" for c in data["changes"]):
+            changed.set()
+
+    bus.add_listener(on_event)
+    while True:
+        changed.clear()
+        try:
+            while await asyncio.to_thread(step):
+                await asyncio.sleep(0.05)  # let queued writers take the lock
+        except Exception:
+            logger.exception("%s indexing failed", label)
+        with suppress(TimeoutError):
+            await asyncio.wait_for(changed.wait(), INDEX_POLL_SECONDS)
+        await asyncio.sleep(INDEX_DEBOUNCE_SECONDS)
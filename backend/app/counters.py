@@ -0,0 +1,95 @@
+"""Denormalized note counters kept in the note_counts side table.
+
+Triggers on notes and note_tags (see init_db) keep one row per counted entity:
+
+    folder / project / tag  total = active (not trashed, not completed) notes
+    subtask                 total / completed = subtasks of a parent note
+
+Reads become a primary-key lookup instead of a COUNT(*) per entity. Run
+`python -m app.counters` to compare the counters against a full recount, and
+`python -m app.counters --rebuild` to repair them.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from collections.abc import Sequence
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+# Ground truth the triggers maintain incrementally
+RECOUNT_SQL = """
+    SELECT 'folder', folder_id, COUNT(*), 0 FROM notes
+    WHERE folder_id IS NOT NULL AND is_trashed = 0 AND is_completed = 0 GROUP BY folder_id
+    UNION ALL
+    SELECT 'project', project_id, COUNT(*), 0 FROM notes
+    WHERE project_id IS NOT NULL AND is_trashed = 0 AND is_completed = 0 GROUP BY project_id
+    UNION ALL
+    SELECT 'tag', nt.tag_id, COUNT(*), 0 FROM note_tags nt JOIN notes n ON n.id = nt.note_id
+    WHERE n.is_trashed = 0 AND n.is_completed = 0 GROUP BY nt.tag_id
+    UNION ALL
+    SELECT 'subtask', parent_id, COUNT(*), SUM(is_completed) FROM notes
+    WHERE parent_id IS NOT NULL GROUP BY parent_id
+"""
+
+_STORED_SQL = "SELECT kind, id, total, completed FROM note_counts WHERE total != 0 OR completed != 0"
+
+
+def load_counts(kind: str, ids: Sequence[str], session: Session) -> dict[str, tuple[int, int]]:
+    """Return {id: (total, completed)} for the given entities; missing ids are zero."""
+    if not ids:
+        return {}
+    rows = session.exec(
+        text("SELECT id, total, completed FROM note_counts WHERE kind = :kind AND id IN (SELECT value FROM json_each(:ids))")
+        .bindparams(kind=kind, ids=json.dumps(list(ids)))
+    ).all()
+    return {id_: (total, completed) for id_, total, completed in rows}
+
+
+def note_counts(kind: str, ids: Sequence[str], session: Session) -> dict[str, int]:
+    return {id_: total for id_, (total, _) in load_counts(kind, ids, session).items()}
+
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """Recompute every counter from scratch (no commit)."""
+    conn.execute("DELETE FROM note_counts")
+    conn.execute(f"INSERT INTO note_counts (kind, id, total, completed) {RECOUNT_SQL}")
+
+
+def check(conn: sqlite3.Connection) -> list[tuple]:
+    """Return (kind, id, stored, expected) for every counter that has drifted."""
+    stored = {(k, i): (t, c) for k, i, t, c in conn.execute(_STORED_SQL)}
+    expected = {(k, i): (t, c) for k, i, t, c in conn.execute(RECOUNT_SQL)}
+    return [
+        (kind, id_, stored.get((kind, id_), (0, 0)), expected.get((kind, id_), (0, 0)))
+        for kind, id_ in sorted(stored.keys() | expected.keys())
+        if stored.get((kind, id_), (0, 0)) != expected.get((kind, id_), (0, 0))
+    ]
+
+
+def main() -> int:
+    from app.database import DATABASE_URL
+
+    parser = argparse.ArgumentParser(prog="python -m app.counters", description="Check or rebuild note counters.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all counters")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE_URL.replace("sqlite:///", ""))
+    try:
+        drift = check(conn)
+        for kind, id_, stored, expected in drift:
+            print(f"{kind} {id_}: stored {stored}, expected {expected}")
+        if args.rebuild:
+            rebuild(conn)
+            conn.commit()
+            print(f"Rebuilt counters ({len(drift)} were wrong)")
+            return 0
+        print("Counters OK" if not drift else f"{len(drift)} counters drifted; run with --rebuild")
+        return 1 if drift else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,6 +26,10 @@ def init_db():
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
 
+    links_exist = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='unresolved_links'"
+    ).fetchone()
+
     conn.executescript("""
         CREATE TABLE IF NOT EXISTS projects (
             id TEXT PRIMARY KEY,
@@ -85,6 +89,12 @@ def init_db():
             PRIMARY KEY (source_id, target_id)
         );
 
+        CREATE TABLE IF NOT EXISTS unresolved_links (
+            source_id TEXT NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
+            title_key TEXT NOT NULL,
+            PRIMARY KEY (source_id, title_key)
+        );
+
         CREATE TABLE IF NOT EXISTS reminders (
             id TEXT PRIMARY KEY,
             note_id TEXT NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
@@ -110,9 +120,21 @@ def init_db():
         CREATE INDEX IF NOT EXISTS idx_notes_folder ON notes(folder_id);
         CREATE INDEX IF NOT EXISTS idx_notes_trashed ON notes(is_trashed);
         CREATE INDEX IF NOT EXISTS idx_notes_pinned ON notes(is_pinned) WHERE is_pinned = 1;
+        CREATE INDEX IF NOT EXISTS idx_notes_listing ON notes(is_trashed, is_pinned DESC, updated_at DESC, id DESC);
         CREATE INDEX IF NOT EXISTS idx_folders_parent ON folders(parent_id);
         CREATE INDEX IF NOT EXISTS idx_note_versions_note ON note_versions(note_id);
+        CREATE INDEX IF NOT EXISTS idx_note_versions_note_created ON note_versions(note_id, created_at);
         CREATE INDEX IF NOT EXISTS idx_note_links_target ON note_links(target_id);
+        CREATE INDEX IF NOT EXISTS idx_unresolved_links_title ON unresolved_links(title_key);
+        CREATE INDEX IF NOT EXISTS idx_notes_title_key ON notes(lower(trim(title)));
+
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            request_hash TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at);
     """)
 
     # -- Finance: Spending --
@@ -235,6 +257,9 @@ def init_db():
         ("notes", "recurrence_rule", "ALTER TABLE notes ADD COLUMN recurrence_rule TEXT DEFAULT NULL"),
         ("notes", "recurrence_source_id", "ALTER TABLE notes ADD COLUMN recurrence_source_id TEXT REFERENCES notes(id) ON DELETE SET NULL"),
         ("tags", "project_id", "ALTER TABLE tags ADD COLUMN project_id TEXT REFERENCES projects(id) ON DELETE CASCADE"),
+        ("note_versions", "base_id", "ALTER TABLE note_versions ADD COLUMN base_id TEXT"),
+        ("note_versions", "delta", "ALTER TABLE note_versions ADD COLUMN delta BLOB"),
+        ("note_versions", "depth", "ALTER TABLE note_versions ADD COLUMN depth INTEGER NOT NULL DEFAULT 0"),
     ]
     for table, column, sql in migrations:
         try:
@@ -295,6 +320,327 @@ def init_db():
             END;
         """)
 
+    # Trigram index for substring and fuzzy search (case-insensitive, any 3+ chars)
+    trigram_exists = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='notes_trigram'"
+    ).fetchone()
+
+    if not trigram_exists:
+        conn.execute("""
+            CREATE VIRTUAL TABLE notes_trigram USING fts5(
+                title, content,
+                content='notes',
+                content_rowid='rowid',
+                tokenize='trigram'
+            )
+        """)
+        conn.execute("INSERT INTO notes_trigram(notes_trigram) VALUES ('rebuild')")
+
+        conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS notes_trigram_insert AFTER INSERT ON notes BEGIN
+                INSERT INTO notes_trigram(rowid, title, content)
+                VALUES (new.rowid, new.title, new.content);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS notes_trigram_delete AFTER DELETE ON notes BEGIN
+                INSERT INTO notes_trigram(notes_trigram, rowid, title, content)
+                VALUES ('delete', old.rowid, old.title, old.content);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS notes_trigram_update AFTER UPDATE OF title, content ON notes BEGIN
+                INSERT INTO notes_trigram(notes_trigram, rowid, title, content)
+                VALUES ('delete', old.rowid, old.title, old.content);
+                INSERT INTO notes_trigram(rowid, title, content)
+                VALUES (new.rowid, new.title, new.content);
+            END;
+        """)
+
+    # Title-only index with prefix tables, for [[link]] and palette autocomplete
+    titles_exist = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='notes_titles'"
+    ).fetchone()
+
+    if not titles_exist:
+        conn.execute("""
+            CREATE VIRTUAL TABLE notes_titles USING fts5(
+                title,
+                content='notes',
+                content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='1 2 3'
+            )
+        """)
+        conn.execute("INSERT INTO notes_titles(notes_titles) VALUES ('rebuild')")
+
+        conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS notes_titles_insert AFTER INSERT ON notes BEGIN
+                INSERT INTO notes_titles(rowid, title) VALUES (new.rowid, new.title);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS notes_titles_delete AFTER DELETE ON notes BEGIN
+                INSERT INTO notes_titles(notes_titles, rowid, title) VALUES ('delete', old.rowid, old.title);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS notes_titles_update AFTER UPDATE OF title ON notes BEGIN
+                INSERT INTO notes_titles(notes_titles, rowid, title) VALUES ('delete', old.rowid, old.title);
+                INSERT INTO notes_titles(rowid, title) VALUES (new.rowid, new.title);
+            END;
+        """)
+
+    # Change log for delta sync: one row per entity, re-inserted (with a fresh seq)
+    # on every write, so `seq > cursor` yields everything changed since the cursor.
+    # Hard deletes leave an op='delete' row behind as a tombstone.
+    sync_exists = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='sync_changes'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            op TEXT NOT NULL DEFAULT 'upsert',
+            UNIQUE(entity, entity_id)
+        )
+    """)
+
+    def log_change(entity: str, key: str, op: str = "upsert") -> str:
+        return f"""
+            DELETE FROM sync_changes WHERE entity = '{entity}' AND entity_id = {key};
+            INSERT INTO sync_changes (entity, entity_id, op) SELECT '{entity}', {key}, '{op}' WHERE {key} IS NOT NULL;
+        """
+
+    for table, entity in [("folders", "folder"), ("tags", "tag"), ("projects", "project")]:
+        conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS sync_{table}_insert AFTER INSERT ON {table} BEGIN
+                {log_change(entity, "new.id")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS sync_{table}_update AFTER UPDATE ON {table} BEGIN
+                {log_change(entity, "new.id")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS sync_{table}_delete AFTER DELETE ON {table} BEGIN
+                {log_change(entity, "old.id", "delete")}
+            END;
+        """)
+
+    # Notes also touch their parent, whose subtask counts depend on them
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS sync_notes_insert AFTER INSERT ON notes BEGIN
+            {log_change("note", "new.id")}
+            {log_change("note", "new.parent_id")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS sync_notes_update AFTER UPDATE ON notes BEGIN
+            {log_change("note", "new.id")}
+            {log_change("note", "new.parent_id")}
+            {log_change("note", "old.parent_id")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS sync_notes_delete AFTER DELETE ON notes BEGIN
+            {log_change("note", "old.id", "delete")}
+            {log_change("note", "old.parent_id")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS sync_note_tags_insert AFTER INSERT ON note_tags BEGIN
+            {log_change("note_tag", "new.note_id || ':' || new.tag_id")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS sync_note_tags_delete AFTER DELETE ON note_tags BEGIN
+            {log_change("note_tag", "old.note_id || ':' || old.tag_id", "delete")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS sync_note_links_insert AFTER INSERT ON note_links BEGIN
+            {log_change("link", "new.source_id || ':' || new.target_id")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS sync_note_links_delete AFTER DELETE ON note_links BEGIN
+            {log_change("link", "old.source_id || ':' || old.target_id", "delete")}
+        END;
+    """)
+
+    if not sync_exists:
+        # Backfill rows that predate the change log so a full sync (since=0) sees them
+        conn.executescript("""
+            INSERT INTO sync_changes (entity, entity_id) SELECT 'project', id FROM projects;
+            INSERT INTO sync_changes (entity, entity_id) SELECT 'folder', id FROM folders;
+            INSERT INTO sync_changes (entity, entity_id) SELECT 'tag', id FROM tags;
+            INSERT INTO sync_changes (entity, entity_id) SELECT 'note', id FROM notes;
+            INSERT INTO sync_changes (entity, entity_id) SELECT 'note_tag', note_id || ':' || tag_id FROM note_tags;
+            INSERT INTO sync_changes (entity, entity_id) SELECT 'link', source_id || ':' || target_id FROM note_links;
+        """)
+
+    # Extracted attachment text (see app/extraction.py). Attachments without an
+    # attachment_text row are still waiting for the background extractor.
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS attachment_text (
+            attachment_id TEXT PRIMARY KEY REFERENCES attachments(id) ON DELETE CASCADE,
+            status TEXT NOT NULL,
+            error TEXT,
+            chars INTEGER NOT NULL DEFAULT 0,
+            extracted_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        );
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS attachments_fts USING fts5(
+            filename, body,
+            tokenize='porter unicode61 remove_diacritics 2'
+        );
+
+        -- New text changes what the parent note matches: bump it in the change log
+        CREATE TRIGGER IF NOT EXISTS attachment_text_insert AFTER INSERT ON attachment_text BEGIN
+            {log_change("note", "(SELECT note_id FROM attachments WHERE id = new.attachment_id)")}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attachments_fts_delete AFTER DELETE ON attachments BEGIN
+            DELETE FROM attachments_fts WHERE rowid = old.rowid;
+            DELETE FROM attachment_text WHERE attachment_id = old.id;
+            {log_change("note", "(SELECT id FROM notes WHERE id = old.note_id)")}
+        END;
+    """)
+
+    # Migration: retry PDFs skipped by builds that ran without pypdf installed
+    conn.execute(
+        "DELETE FROM attachment_text WHERE status = 'unsupported' AND attachment_id IN"
+        " (SELECT id FROM attachments WHERE mime_type = 'application/pdf')"
+    )
+
+    # TF-IDF index for related notes (see app/related.py), built by a background
+    # indexer that follows sync_changes from its row in index_cursors
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS note_terms (
+            term TEXT NOT NULL,
+            note_id TEXT NOT NULL,
+            weight REAL NOT NULL,
+            PRIMARY KEY (term, note_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_note_terms_note ON note_terms(note_id);
+
+        CREATE TABLE IF NOT EXISTS term_stats (
+            term TEXT PRIMARY KEY,
+            df INTEGER NOT NULL
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS note_vectors (
+            note_id TEXT PRIMARY KEY,
+            norm REAL NOT NULL,
+            corpus_size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS index_cursors (
+            name TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        );
+
+        CREATE TRIGGER IF NOT EXISTS note_terms_insert AFTER INSERT ON note_terms BEGIN
+            INSERT INTO term_stats (term, df) VALUES (new.term, 1)
+            ON CONFLICT(term) DO UPDATE SET df = df + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS note_terms_delete AFTER DELETE ON note_terms BEGIN
+            UPDATE term_stats SET df = df - 1 WHERE term = old.term;
+            DELETE FROM term_stats WHERE term = old.term AND df <= 0;
+        END;
+    """)
+
+    # MinHash signatures and LSH band buckets for near-duplicate detection (see app/duplicates.py)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS note_minhash (
+            note_id TEXT PRIMARY KEY,
+            signature BLOB NOT NULL,
+            content_hash TEXT NOT NULL
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS note_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            note_id TEXT NOT NULL,
+            PRIMARY KEY (band, bucket, note_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_note_lsh_note ON note_lsh(note_id);
+    """)
+
+    # Denormalized counters (see app/counters.py), adjusted by +/- deltas so
+    # list reads don't COUNT(*) per folder, tag, project or parent note
+    counts_exist = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='note_counts'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS note_counts (
+            kind TEXT NOT NULL,
+            id TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, id)
+        ) WITHOUT ROWID
+    """)
+
+    def count_delta(kind: str, key: str, total: str, completed: str = "0", source: str = "", where: str = "1") -> str:
+        return f"""
+            INSERT INTO note_counts (kind, id, total, completed)
+            SELECT '{kind}', {key}, {total}, {completed} {source}
+            WHERE {where} AND {key} IS NOT NULL AND ({total} != 0 OR {completed} != 0)
+            ON CONFLICT (kind, id) DO UPDATE
+            SET total = total + excluded.total, completed = completed + excluded.completed;
+        """
+
+    old_active = "(old.is_trashed = 0 AND old.is_completed = 0)"
+    new_active = "(new.is_trashed = 0 AND new.is_completed = 0)"
+    # A parent deleted in the same statement as its subtasks has already dropped its counter
+    parent_exists = "EXISTS (SELECT 1 FROM notes WHERE id = old.parent_id)"
+    note_active = "EXISTS (SELECT 1 FROM notes WHERE id = {}.note_id AND is_trashed = 0 AND is_completed = 0)"
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS counts_notes_insert AFTER INSERT ON notes BEGIN
+            {count_delta("folder", "new.folder_id", new_active)}
+            {count_delta("project", "new.project_id", new_active)}
+            {count_delta("subtask", "new.parent_id", "1", "new.is_completed")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS counts_notes_update
+        AFTER UPDATE OF folder_id, project_id, parent_id, is_trashed, is_completed ON notes BEGIN
+            {count_delta("folder", "old.folder_id", f"-{old_active}")}
+            {count_delta("folder", "new.folder_id", new_active)}
+            {count_delta("project", "old.project_id", f"-{old_active}")}
+            {count_delta("project", "new.project_id", new_active)}
+            {count_delta("subtask", "old.parent_id", "-1", "-old.is_completed")}
+            {count_delta("subtask", "new.parent_id", "1", "new.is_completed")}
+            {count_delta("tag", "tag_id", f"{new_active} - {old_active}", source="FROM note_tags", where="note_id = new.id")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS counts_notes_delete AFTER DELETE ON notes BEGIN
+            {count_delta("folder", "old.folder_id", f"-{old_active}")}
+            {count_delta("project", "old.project_id", f"-{old_active}")}
+            {count_delta("subtask", "old.parent_id", "-1", "-old.is_completed", where=parent_exists)}
+            {count_delta("tag", "tag_id", f"-{old_active}", source="FROM note_tags", where="note_id = old.id")}
+            DELETE FROM note_counts WHERE kind = 'subtask' AND id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS counts_note_tags_insert AFTER INSERT ON note_tags
+        WHEN {note_active.format("new")} BEGIN
+            {count_delta("tag", "new.tag_id", "1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS counts_note_tags_delete AFTER DELETE ON note_tags
+        WHEN {note_active.format("old")} BEGIN
+            {count_delta("tag", "old.tag_id", "-1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS counts_folders_delete AFTER DELETE ON folders BEGIN
+            DELETE FROM note_counts WHERE kind = 'folder' AND id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS counts_tags_delete AFTER DELETE ON tags BEGIN
+            DELETE FROM note_counts WHERE kind = 'tag' AND id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS counts_projects_delete AFTER DELETE ON projects BEGIN
+            DELETE FROM note_counts WHERE kind = 'project' AND id = old.id;
+        END;
+    """)
+
+    if not counts_exist:
+        from app.counters import rebuild
+        rebuild(conn)
+
+    if not links_exist:
+        # Park [[titles]] that had no target before unresolved links were tracked
+        from app.links import link_keys
+        live = {r[0] for r in conn.execute("SELECT DISTINCT lower(trim(title)) FROM notes WHERE is_trashed = 0")}
+        conn.executemany(
+            "INSERT OR IGNORE INTO unresolved_links (source_id, title_key) VALUES (?, ?)",
+            [
+                (note_id, key)
+                for note_id, content in conn.execute("SELECT id, content FROM notes").fetchall()
+                for key in link_keys(content)
+                if key not in live
+            ],
+        )
+
     # Seed default scheduled summaries if table is empty
     count = conn.execute("SELECT COUNT(*) FROM scheduled_summaries").fetchone()[0]
     if count == 0:
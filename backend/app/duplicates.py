@@ -0,0 +1,183 @@
+"""Near-duplicate detection with MinHash signatures and LSH banding.
+
+Each note's text is reduced to word 3-gram shingles and a MinHash signature of
+SIGNATURE_SIZE 64-bit minima, whose agreement rate estimates the Jaccard
+similarity of two notes' shingle sets. The signature is cut into LSH_BANDS
+bands; notes sharing any band hash land in the same note_lsh bucket and become
+candidates. With 16 bands of 4 rows, pairs above ~0.5 similarity almost always
+share a bucket and dissimilar ones rarely do, so finding duplicates is one
+grouped scan of the bucket table instead of comparing every pair.
+
+Signatures are kept current by a background indexer following sync_changes
+(see app/changes.py), like the related-notes index.
+"""
+import hashlib
+import json
+import random
+import re
+import struct
+from collections import defaultdict
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.changes import advance_cursor, follow_notes, note_changes_after
+from app.database import engine
+
+INDEX_BATCH = 200
+SIGNATURE_SIZE = 64
+LSH_BANDS = 16
+LSH_ROWS = SIGNATURE_SIZE // LSH_BANDS
+SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"\w+")
+# One XOR mask per signature slot stands in for independent hash functions
+_MASKS = [random.Random(seed).getrandbits(64) for seed in range(SIGNATURE_SIZE)]
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+def shingles(title: str, content: str) -> set[str]:
+    words = _WORD_RE.findall(f"{title}\n{content}".lower())
+    k = min(SHINGLE_WORDS, len(words))
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)} if k else set()
+
+
+def signature(items: set[str]) -> list[int]:
+    hashes = [_hash64(s) for s in items]
+    return [min(h ^ mask for h in hashes) for mask in _MASKS]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / SIGNATURE_SIZE
+
+
+def _pack(sig: list[int]) -> bytes:
+    return struct.pack(f"<{SIGNATURE_SIZE}Q", *sig)
+
+
+def _unpack(blob: bytes) -> list[int]:
+    return list(struct.unpack(f"<{SIGNATURE_SIZE}Q", blob))
+
+
+def _bands(sig: list[int]) -> list[int]:
+    # Signed, so the bucket fits an SQLite INTEGER
+    return [
+        _hash64(",".join(map(str, sig[b * LSH_ROWS:(b + 1) * LSH_ROWS]))) - (1 << 63)
+        for b in range(LSH_BANDS)
+    ]
+
+
+def index_notes(session: Session, note_ids: list[str]) -> int:
+    """(Re)compute signatures for the given notes; missing or empty notes are dropped."""
+    ids = json.dumps(note_ids)
+    notes = session.exec(
+        text("SELECT id, title, content FROM notes WHERE id IN (SELECT value FROM json_each(:ids))").bindparams(ids=ids)
+    ).all()
+    hashes = dict(session.exec(
+        text("SELECT note_id, content_hash FROM note_minhash WHERE note_id IN (SELECT value FROM json_each(:ids))")
+        .bindparams(ids=ids)
+    ).all())
+
+    signatures, buckets, stale = [], [], set(note_ids) - {n[0] for n in notes}
+    for note_id, title, content in notes:
+        digest = hashlib.sha1(f"{title}\0{content}".encode()).hexdigest()
+        if hashes.get(note_id) == digest:
+            continue
+        stale.add(note_id)
+        items = shingles(title, content)
+        if not items:
+            continue
+        sig = signature(items)
+        signatures.append({"id": note_id, "sig": _pack(sig), "hash": digest})
+        buckets += [{"band": b, "bucket": h, "id": note_id} for b, h in enumerate(_bands(sig))]
+
+    stale_ids = json.dumps(list(stale))
+    session.exec(text("DELETE FROM note_lsh WHERE note_id IN (SELECT value FROM json_each(:ids))").bindparams(ids=stale_ids))
+    session.exec(text("DELETE FROM note_minhash WHERE note_id IN (SELECT value FROM json_each(:ids))").bindparams(ids=stale_ids))
+    if signatures:
+        session.exec(
+            text("INSERT INTO note_minhash (note_id, signature, content_hash) VALUES (:id, :sig, :hash)"),
+            params=signatures,
+        )
+        session.exec(text("INSERT INTO note_lsh (band, bucket, note_id) VALUES (:band, :bucket, :id)"), params=buckets)
+    return len(signatures)
+
+
+def catch_up(session: Session, batch: int = INDEX_BATCH) -> bool:
+    """Index notes changed since the stored cursor, one batch. Returns True if more remain."""
+    note_ids, seq = note_changes_after(session, "duplicates", batch)
+    if seq is None:
+        return False
+    index_notes(session, note_ids)
+    advance_cursor(session, "duplicates", seq)
+    session.commit()
+    return True
+
+
+def find_clusters(session: Session, threshold: float) -> list[tuple[list[str], float]]:
+    """Groups of live notes whose estimated similarity is at least `threshold`.
+
+    Returns (note ids, lowest similarity that joined the group), largest first.
+    Each bucket's members are verified against the bucket's first member, so a
+    bucket costs time linear in its size even for thousands of clones.
+    """
+    groups = session.exec(text(
+        "SELECT json_group_array(l.note_id) FROM note_lsh l"
+        " JOIN notes n ON n.id = l.note_id AND n.is_trashed = 0"
+        " GROUP BY l.band, l.bucket HAVING COUNT(*) > 1"
+    )).all()
+    groups = [json.loads(row[0]) for row in groups]
+    members = {note_id for group in groups for note_id in group}
+    sigs = {
+        note_id: _unpack(blob)
+        for note_id, blob in session.exec(
+            text("SELECT note_id, signature FROM note_minhash WHERE note_id IN (SELECT value FROM json_each(:ids))")
+            .bindparams(ids=json.dumps(sorted(members)))
+        ).all()
+    }
+
+    parent: dict[str, str] = {}
+
+    def find(x: str) -> str:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    # Pairs recur across bands; verify each once
+    verified: dict[tuple[str, str], float] = {}
+    for group in groups:
+        rep, *others = sorted(group)
+        for other in others:
+            if (rep, other) not in verified:
+                verified[rep, other] = similarity(sigs[rep], sigs[other])
+                if verified[rep, other] >= threshold:
+                    parent[find(other)] = find(rep)
+
+    clusters: dict[str, list[str]] = defaultdict(list)
+    for note_id in list(parent):
+        clusters[find(note_id)].append(note_id)
+    lowest: dict[str, float] = {}
+    for (rep, _), sim in verified.items():
+        if sim >= threshold:
+            root = find(rep)
+            lowest[root] = min(lowest.get(root, 1.0), sim)
+    return sorted(
+        ((sorted(ids), lowest[root]) for root, ids in clusters.items()),
+        key=lambda c: (-len(c[0]), c[0][0]),
+    )
+
+
+def _catch_up() -> bool:
+    with Session(engine) as session:
+        return catch_up(session)
+
+
+async def run_indexer() -> None:
+    """Keep MinHash signatures current, waking shortly after notes change."""
+    await follow_notes(_catch_up, "Duplicate")
@@ -0,0 +1,115 @@
+"""In-process change bus feeding the /events server-sent event stream.
+
+Committed ORM writes are collected per session and published as one "change"
+event per commit, so routers don't need to publish explicitly. Code that writes
+with raw SQL calls `bus.publish` itself. Publishing is thread-safe: sync route
+handlers run in the threadpool and hand events to the event loop.
+"""
+import asyncio
+import json
+from collections.abc import Callable, Iterable
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+QUEUE_SIZE = 256
+
+
+class Subscriber:
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        # Set when events were dropped; the client should refetch everything
+        self.overflowed = False
+
+    def deliver(self, kind: str, data: Any) -> None:
+        try:
+            self.queue.put_nowait((kind, data))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: set[Subscriber] = set()
+        self._listeners: list[Callable[[str, Any], None]] = []
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber()
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+
+    def add_listener(self, callback: Callable[[str, Any], None]) -> None:
+        """Call `callback(kind, data)` on the event loop for every published event."""
+        self._listeners.append(callback)
+
+    def publish(self, kind: str, data: Any) -> None:
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._dispatch, kind, data)
+
+    def _dispatch(self, kind: str, data: Any) -> None:
+        for sub in self._subscribers:
+            sub.deliver(kind, data)
+        for callback in self._listeners:
+            callback(kind, data)
+
+
+bus = EventBus()
+
+
+def format_sse(kind: str, data: Any) -> str:
+    return f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def publish_changes(changes: list[dict]) -> None:
+    """Publish a batch of {"entity", "id", "op"} dicts as one change event."""
+    if changes:
+        bus.publish("change", {"changes": changes})
+
+
+def _primary_key(obj: Any) -> str:
+    # Association rows (note_tags, note_links) have composite keys: "<a>:<b>"
+    return ":".join(str(getattr(obj, c)) for c in obj.__table__.primary_key.columns.keys())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    pending = session.info.setdefault("pending_changes", {})
+    for obj in session.new:
+        pending[(obj.__tablename__, _primary_key(obj))] = "upsert"
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            pending[(obj.__tablename__, _primary_key(obj))] = "upsert"
+    for obj in session.deleted:
+        pending[(obj.__tablename__, _primary_key(obj))] = "delete"
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session) -> None:
+    pending = session.info.pop("pending_changes", None)
+    if pending:
+        publish_changes([{"entity": e, "id": i, "op": op} for (e, i), op in pending.items()])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop("pending_changes", None)
+
+
+def record_changes(session: Session, entity: str, ids: Iterable[str], op: str = "upsert") -> None:
+    """Queue changes made with raw SQL, which the ORM flush hook can't see."""
+    pending = session.info.setdefault("pending_changes", {})
+    for entity_id in ids:
+        pending[(entity, entity_id)] = op
@@ -0,0 +1,143 @@
+"""Background text extraction from attachments into the attachments_fts index.
+
+The queue is implicit: an attachment without an attachment_text row has not
+been processed yet, so work resumes after a restart and uploads only have to
+nudge the extractor. Files are read and parsed on a small thread pool; results
+are written back in one short transaction per batch.
+
+Plain text, markdown and CSV are indexed as-is, PDFs through pypdf. Other
+types are marked "unsupported" and only their filename is indexed.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import NamedTuple, Optional
+
+from pypdf import PdfReader
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENTS_DIR = "data/attachments"
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+EXTRACT_POLL_SECONDS = 300
+EXTRACT_BATCH = 8
+# Longer texts are truncated before indexing
+MAX_TEXT_CHARS = 2_000_000
+
+TEXT_TYPES = {"text/plain", "text/markdown", "text/csv"}
+
+_wake: Optional[asyncio.Event] = None
+
+
+class PendingAttachment(NamedTuple):
+    id: str
+    note_id: str
+    filename: str
+    mime_type: str
+
+
+class Extracted(NamedTuple):
+    id: str
+    status: str  # "done" | "unsupported" | "failed"
+    body: str = ""
+    error: Optional[str] = None
+
+
+def notify() -> None:
+    """Wake the extractor after an upload (call from the event loop)."""
+    if _wake is not None:
+        _wake.set()
+
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8-sig", errors="replace")
+
+
+def _read_pdf(path: str) -> str:
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        pages.append(page.extract_text() or "")
+        if sum(map(len, pages)) >= MAX_TEXT_CHARS:
+            break
+    return "\n".join(pages)
+
+
+def extract(att: PendingAttachment) -> Extracted:
+    """Pull the text out of one attachment file. Runs on the worker pool."""
+    path = os.path.join(ATTACHMENTS_DIR, att.note_id, att.filename)
+    try:
+        if att.mime_type in TEXT_TYPES:
+            body = _read_text(path)
+        elif att.mime_type == "application/pdf":
+            body = _read_pdf(path)
+        else:
+            return Extracted(att.id, "unsupported")
+    except Exception as exc:
+        return Extracted(att.id, "failed", error=f"{type(exc).__name__}: {exc}"[:500])
+    return Extracted(att.id, "done", body[:MAX_TEXT_CHARS])
+
+
+def pending(session: Session, limit: int) -> list[PendingAttachment]:
+    rows = session.exec(text(
+        "SELECT a.id, a.note_id, a.filename, a.mime_type FROM attachments a"
+        " JOIN notes n ON n.id = a.note_id"
+        " WHERE NOT EXISTS (SELECT 1 FROM attachment_text t WHERE t.attachment_id = a.id)"
+        " ORDER BY a.rowid LIMIT :limit"
+    ).bindparams(limit=limit)).all()
+    return [PendingAttachment(*row) for row in rows]
+
+
+def store(session: Session, results: list[Extracted]) -> None:
+    """Index extracted text; attachments deleted in the meantime are skipped."""
+    for r in results:
+        params = {"id": r.id}
+        session.exec(text(
+            "DELETE FROM attachments_fts WHERE rowid = (SELECT rowid FROM attachments WHERE id = :id)"
+        ).bindparams(**params))
+        session.exec(text(
+            "INSERT INTO attachments_fts (rowid, filename, body)"
+            " SELECT rowid, original_filename, :body FROM attachments WHERE id = :id"
+        ).bindparams(body=r.body, **params))
+        session.exec(text(
+            "INSERT OR REPLACE INTO attachment_text (attachment_id, status, error, chars)"
+            " SELECT id, :status, :error, :chars FROM attachments WHERE id = :id"
+        ).bindparams(status=r.status, error=r.error, chars=len(r.body), **params))
+    session.commit()
+
+
+def _pending_batch() -> list[PendingAttachment]:
+    with Session(engine) as session:
+        return pending(session, EXTRACT_BATCH)
+
+
+def _store_batch(results: list[Extracted]) -> None:
+    with Session(engine) as session:
+        store(session, results)
+
+
+async def run_extractor() -> None:
+    """Index attachment text until cancelled, sleeping while the queue is empty."""
+    global _wake
+    _wake = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(EXTRACT_WORKERS, thread_name_prefix="extract") as pool:
+        while True:
+            _wake.clear()
+            try:
+                batch = await asyncio.to_thread(_pending_batch)
+                if batch:
+                    results = await asyncio.gather(*(loop.run_in_executor(pool, extract, att) for att in batch))
+                    await asyncio.to_thread(_store_batch, list(results))
+                    continue
+            except Exception:
+                logger.exception("Attachment extraction failed")
+            with suppress(TimeoutError):
+                await asyncio.wait_for(_wake.wait(), EXTRACT_POLL_SECONDS)
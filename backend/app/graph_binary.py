@@ -0,0 +1,64 @@
+"""Compact columnar encoding of GraphData, served for Accept: application/vnd.every-note.graph.
+
+Layout, all integers little-endian:
+
+    header   "ENG1", u32 node_count, u32 edge_count, u32 table_len, i64 version (-1 if unknown)
+    table    UTF-8 JSON {"ids", "titles", "folder_ids", "kinds", "x", "y", "pagerank",
+             "component", "edge_types", "layout_version"}, one array per node column,
+             space-padded so the arrays below start 4-byte aligned
+    sources  u32[edge_count], indices into the node columns
+    targets  u32[edge_count]
+    types    u8[edge_count], indices into edge_types
+
+A browser can view the edge arrays in place (new Uint32Array(buffer, offset,
+count)) without building an object per edge, and no node id is repeated.
+"""
+import json
+import struct
+import sys
+from array import array
+
+from app.schemas import GraphData
+
+MEDIA_TYPE = "application/vnd.every-note.graph"
+MAGIC = b"ENG1"
+# Wire codes for edge types; append only
+EDGE_TYPES = ["link", "tag", "folder"]
+
+_HEADER = struct.Struct("<4sIIIq")
+
+
+def _u32(values: list[int]) -> bytes:
+    arr = array("I", values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def encode_graph(data: GraphData) -> bytes:
+    index = {node.id: i for i, node in enumerate(data.nodes)}
+    table = json.dumps({
+        "ids": [node.id for node in data.nodes],
+        "titles": [node.title for node in data.nodes],
+        "folder_ids": [node.folder_id for node in data.nodes],
+        "kinds": [node.kind for node in data.nodes],
+        "x": [node.x for node in data.nodes],
+        "y": [node.y for node in data.nodes],
+        "pagerank": [node.pagerank for node in data.nodes],
+        "component": [node.component for node in data.nodes],
+        "edge_types": EDGE_TYPES,
+        "layout_version": data.layout_version,
+    }, separators=(",", ":")).encode()
+    table += b" " * (-(_HEADER.size + len(table)) % 4)
+
+    edges = [e for e in data.edges if e.source in index and e.target in index]
+    header = _HEADER.pack(
+        MAGIC, len(data.nodes), len(edges), len(table), -1 if data.version is None else data.version
+    )
+    return b"".join([
+        header,
+        table,
+        _u32([index[e.source] for e in edges]),
+        _u32([index[e.target] for e in edges]),
+        bytes(EDGE_TYPES.index(e.type) for e in edges),
+    ])
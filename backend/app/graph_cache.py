@@ -0,0 +1,196 @@
+"""In-memory graph of notes, wiki-links, tags and folders, kept up to date incrementally.
+
+The first request loads everything; later requests replay only the
+sync_changes rows written since (see app/changes.py). `version` is the last seq
+applied and `changed` the last seq that altered something the graph shows (a
+note's title, folder or trash state, a link, a tag assignment, a tag or folder
+name), which is what ETags are derived from; content-only edits leave it alone.
+`structure` moves only when nodes or edges do, not on renames, and keys the
+precomputed layout. Link and tag assignments are kept for trashed notes too and
+filtered on output, so trashing and restoring a note is a one-row update.
+"""
+import json
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.changes import changes_since, current_seq
+
+# Past this many pending changes a full reload is cheaper than replaying them
+REPLAY_LIMIT = 5000
+GRAPH_ENTITIES = {"note", "link", "note_tag", "tag", "folder"}
+
+
+def _pair(key: str) -> tuple[str, str]:
+    a, _, b = key.partition(":")
+    return a, b
+
+
+class GraphCache:
+    def __init__(self) -> None:
+        self.version = -1
+        self.changed = -1
+        self.structure = -1
+        self.notes: dict[str, tuple[str, Optional[str]]] = {}  # live note id -> (title, folder_id)
+        self.links: dict[str, set[str]] = {}  # source -> targets
+        self.backlinks: dict[str, set[str]] = {}  # target -> sources
+        self.note_tags: dict[str, set[str]] = {}  # note -> tag ids
+        self.tag_notes: dict[str, set[str]] = {}  # tag -> note ids
+        self.tag_names: dict[str, str] = {}
+        self.folder_names: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    # --- Loading ---
+
+    def _load_notes(self, session: Session, ids: Optional[list[str]] = None) -> tuple[bool, bool]:
+        """(Re)load notes; returns (any graph-visible field changed, any node or folder membership changed)."""
+        sql = "SELECT id, title, folder_id, is_trashed FROM notes"
+        params: dict = {}
+        before = {}
+        if ids is not None:
+            sql += " WHERE id IN (SELECT value FROM json_each(:ids))"
+            params["ids"] = json.dumps(ids)
+            before = {note_id: self.notes.pop(note_id, None) for note_id in ids}
+        for note_id, title, folder_id, is_trashed in session.exec(text(sql).bindparams(**params)).all():
+            if not is_trashed:
+                self.notes[note_id] = (title or "Untitled", folder_id)
+        visible = structural = False
+        for note_id, old in before.items():
+            new = self.notes.get(note_id)
+            visible |= new != old
+            # Live-ness and folder shape the graph; a title is only a label
+            structural |= (new is None, new and new[1]) != (old is None, old and old[1])
+        return visible, structural
+
+    def _load_names(
+        self, session: Session, table: str, names: dict[str, str], ids: Optional[list[str]] = None
+    ) -> tuple[bool, bool]:
+        """(Re)load tag or folder names; returns (any name changed, any group appeared or went)."""
+        sql = f"SELECT id, name FROM {table}"
+        params: dict = {}
+        before = {}
+        if ids is not None:
+            sql += " WHERE id IN (SELECT value FROM json_each(:ids))"
+            params["ids"] = json.dumps(ids)
+            before = {group_id: names.pop(group_id, None) for group_id in ids}
+        names.update(session.exec(text(sql).bindparams(**params)).all())
+        visible = any(names.get(group_id) != old for group_id, old in before.items())
+        structural = any((group_id in names) != (old is not None) for group_id, old in before.items())
+        return visible, structural
+
+    def _set_link(self, source: str, target: str, present: bool) -> bool:
+        """Add or remove a link; returns whether that changed anything."""
+        targets = self.links.setdefault(source, set())
+        if (target in targets) == present:
+            return False
+        if present:
+            targets.add(target)
+            self.backlinks.setdefault(target, set()).add(source)
+        else:
+            targets.discard(target)
+            self.backlinks.get(target, set()).discard(source)
+        return True
+
+    def _set_tag(self, note_id: str, tag_id: str, present: bool) -> bool:
+        """Add or remove a tag assignment; returns whether that changed anything."""
+        tag_ids = self.note_tags.setdefault(note_id, set())
+        if (tag_id in tag_ids) == present:
+            return False
+        if present:
+            tag_ids.add(tag_id)
+            self.tag_notes.setdefault(tag_id, set()).add(note_id)
+        else:
+            tag_ids.discard(tag_id)
+            self.tag_notes.get(tag_id, set()).discard(note_id)
+        return True
+
+    def _reload(self, session: Session, version: int) -> None:
+        self.notes, self.links, self.backlinks, self.note_tags, self.tag_notes = {}, {}, {}, {}, {}
+        self.tag_names, self.folder_names = {}, {}
+        self._load_notes(session)
+        for source, target in session.exec(text("SELECT source_id, target_id FROM note_links")).all():
+            self._set_link(source, target, True)
+        for note_id, tag_id in session.exec(text("SELECT note_id, tag_id FROM note_tags")).all():
+            self._set_tag(note_id, tag_id, True)
+        self._load_names(session, "tags", self.tag_names)
+        self._load_names(session, "folders", self.folder_names)
+        self.version = self.changed = self.structure = version
+
+    @contextmanager
+    def current(self, session: Session) -> Iterator["GraphCache"]:
+        """Bring the graph up to the latest change and hold it steady while the caller reads it."""
+        with self._lock:
+            self._refresh(session)
+            yield self
+
+    def _refresh(self, session: Session) -> None:
+        latest = current_seq(session)
+        if latest <= self.version:
+            return  # already current, or another request saw a newer snapshot
+        changes = changes_since(session, self.version, REPLAY_LIMIT + 1) if self.version >= 0 else []
+        if self.version < 0 or len(changes) > REPLAY_LIMIT:
+            self._reload(session, latest)
+            return
+
+        # Each read is its own snapshot; leave later commits to the next refresh
+        changes = [c for c in changes if c.seq <= latest]
+        changed = structural = False
+        touched: dict[str, list[str]] = {}
+        for c in changes:
+            if c.entity == "link":
+                structural |= self._set_link(*_pair(c.entity_id), c.op != "delete")
+            elif c.entity == "note_tag":
+                structural |= self._set_tag(*_pair(c.entity_id), c.op != "delete")
+            elif c.entity in GRAPH_ENTITIES:
+                touched.setdefault(c.entity, []).append(c.entity_id)
+        for entity, load in [
+            ("note", self._load_notes),
+            ("tag", lambda session, ids: self._load_names(session, "tags", self.tag_names, ids)),
+            ("folder", lambda session, ids: self._load_names(session, "folders", self.folder_names, ids)),
+        ]:
+            if ids := touched.get(entity):
+                visible, moved = load(session, ids)
+                changed, structural = changed or visible, structural or moved
+
+        self.version = latest
+        if changed or structural:
+            self.changed = latest
+        if structural:
+            self.structure = latest
+
+    # --- Reading (inside `current`) ---
+
+    def live_links(self, note_ids: Optional[Iterable[str]] = None) -> Iterable[tuple[str, str]]:
+        sources = self.links if note_ids is None else {n: self.links.get(n, ()) for n in note_ids}
+        for source, targets in sources.items():
+            if source in self.notes:
+                for target in targets:
+                    if target in self.notes:
+                        yield source, target
+
+    def neighbors(self, note_id: str) -> list[str]:
+        """Live notes linked to or from a note, sorted."""
+        linked = self.links.get(note_id, set()) | self.backlinks.get(note_id, set())
+        return sorted(n for n in linked if n in self.notes and n != note_id)
+
+    def tag_groups(self) -> dict[str, list[str]]:
+        groups: dict[str, list[str]] = {}
+        for note_id, tag_ids in self.note_tags.items():
+            if note_id in self.notes:
+                for tag_id in tag_ids:
+                    groups.setdefault(tag_id, []).append(note_id)
+        return groups
+
+    def folder_groups(self) -> dict[str, list[str]]:
+        groups: dict[str, list[str]] = {}
+        for note_id, (_, folder_id) in self.notes.items():
+            if folder_id:
+                groups.setdefault(folder_id, []).append(note_id)
+        return groups
+
+
+graph_cache = GraphCache()
@@ -0,0 +1,290 @@
+"""Precomputed graph layout, PageRank and connected components.
+
+A background job recomputes these when the graph's structure changes (the
+graph cache's `structure` seq, which renames and content edits leave alone) and
+/graph attaches them to its nodes, so clients only render. Runs are coalesced:
+after each one the job idles for LAYOUT_IDLE_FACTOR times as long as the run
+took, and at least LAYOUT_MIN_INTERVAL seconds, so a burst of edits costs one
+recompute and the job never holds more than a small share of the CPU.
+
+The layout is Fruchterman-Reingold over the mode=groups graph, with
+repulsion binned on a grid of cells twice the ideal edge length: a node is
+pushed by the nodes in its own and adjacent cells, and a crowded cell acts as
+one body at its centroid, so an iteration stays linear in the graph size.
+Each iteration works on whole numpy arrays: a sparse cell's members are padded
+to CELL_EXACT slots so every node's pushes are computed in one pass.
+Nodes from the previous layout keep their positions and new ones start beside
+their neighbors, so after small edits a short, cool run is enough.
+PageRank and components are computed over wiki-links between notes.
+"""
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import defaultdict
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+from sqlmodel import Session
+
+from app.database import engine
+from app.events import bus
+from app.graph_cache import GraphCache, graph_cache
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_ITERATIONS = 60
+# Iterations when most nodes keep their previous position
+WARM_ITERATIONS = 15
+# Cells with more nodes than this repel as a single body
+CELL_EXACT = 16
+GRAVITY = 0.05
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 100
+PAGERANK_TOLERANCE = 1e-9
+
+GRAPH_TABLES = {"notes", "note_links", "note_tags", "tags", "folders"}
+LAYOUT_MIN_INTERVAL = 30
+LAYOUT_IDLE_FACTOR = 4
+LAYOUT_POLL_SECONDS = 300
+
+
+@dataclass
+class GraphMetrics:
+    version: int  # graph_cache.structure the metrics were computed at
+    positions: dict[str, tuple[float, float]] = field(default_factory=dict)
+    pagerank: dict[str, float] = field(default_factory=dict)
+    components: dict[str, int] = field(default_factory=dict)  # 0 is the largest
+
+
+_latest: Optional[GraphMetrics] = None
+
+
+def latest() -> Optional[GraphMetrics]:
+    """The most recent metrics, possibly for an older graph version; None until the first run."""
+    return _latest
+
+
+def _snapshot(g: GraphCache) -> tuple[list[str], list[tuple[str, str]], list[tuple[str, str]]]:
+    """(node ids, layout edges, wiki-links) of the mode=groups graph, copied out of the cache."""
+    ids = list(g.notes)
+    links = list(g.live_links())
+    edges = list(links)
+    for kind, groups in [("tag", g.tag_groups()), ("folder", g.folder_groups())]:
+        for group_id, members in groups.items():
+            ids.append(f"{kind}:{group_id}")
+            edges.extend((note_id, f"{kind}:{group_id}") for note_id in members)
+    return ids, edges, links
+
+
+def pagerank(ids: list[str], links: list[tuple[str, str]]) -> dict[str, float]:
+    """PageRank by power iteration; dangling notes spread their rank evenly."""
+    n = len(ids)
+    if not n:
+        return {}
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    pairs = np.array([(index[s], index[t]) for s, t in links if s != t], dtype=np.int64).reshape(-1, 2)
+    source, target = pairs[:, 0], pairs[:, 1]
+    out_degree = np.bincount(source, minlength=n)
+    dangling_nodes = out_degree == 0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(PAGERANK_ITERATIONS):
+        dangling = rank[dangling_nodes].sum()
+        base = (1 - PAGERANK_DAMPING + PAGERANK_DAMPING * dangling) / n
+        share = np.divide(rank, out_degree, out=np.zeros(n), where=~dangling_nodes)
+        new = base + PAGERANK_DAMPING * np.bincount(target, share[source], n)
+        delta = np.abs(new - rank).sum()
+        rank = new
+        if delta < PAGERANK_TOLERANCE:
+            break
+    return dict(zip(ids, rank.tolist()))
+
+
+def components(ids: list[str], links: list[tuple[str, str]]) -> dict[str, int]:
+    """Connected components of the undirected link graph, numbered largest first."""
+    parent = {node_id: node_id for node_id in ids}
+
+    def find(x: str) -> str:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for s, t in links:
+        a, b = find(s), find(t)
+        if a != b:
+            parent[a] = b
+    members: dict[str, list[str]] = defaultdict(list)
+    for node_id in ids:
+        members[find(node_id)].append(node_id)
+    ordered = sorted(members.values(), key=lambda m: (-len(m), min(m)))
+    return {node_id: i for i, group in enumerate(ordered) for node_id in group}
+
+
+def layout(
+    ids: list[str], edges: list[tuple[str, str]], previous: Optional[dict[str, tuple[float, float]]] = None
+) -> dict[str, tuple[float, float]]:
+    """Force-directed positions with an ideal edge length of 1."""
+    n = len(ids)
+    if not n:
+        return {}
+    previous = previous or {}
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    pairs = np.array([(index[s], index[t]) for s, t in edges if s != t], dtype=np.int64).reshape(-1, 2)
+    neighbors: list[list[int]] = [[] for _ in range(n)]
+    for a, b in pairs.tolist():
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+
+    rng = random.Random(0)
+    side = math.sqrt(n)
+    xs, ys = [0.0] * n, [0.0] * n
+    placed = [False] * n
+    for i, node_id in enumerate(ids):
+        if node_id in previous:
+            xs[i], ys[i] = previous[node_id]
+            placed[i] = True
+    kept = sum(placed)
+    for i in range(n):
+        if not placed[i]:
+            anchors = [j for j in neighbors[i] if placed[j]]
+            if anchors:
+                xs[i] = sum(xs[j] for j in anchors) / len(anchors) + rng.uniform(-0.5, 0.5)
+                ys[i] = sum(ys[j] for j in anchors) / len(anchors) + rng.uniform(-0.5, 0.5)
+            else:
+                xs[i], ys[i] = rng.uniform(-side, side) / 2, rng.uniform(-side, side) / 2
+            placed[i] = True
+
+    pos = np.column_stack([xs, ys])
+    jitter = np.random.default_rng(0)
+    warm = kept >= n * 0.9
+    iterations = WARM_ITERATIONS if warm else LAYOUT_ITERATIONS
+    start = 0.5 if warm else side / 4
+    cell = 2.0
+    for step in range(iterations):
+        temperature = max(start * (1 - step / iterations), 0.01)
+        disp = _repulsion(pos, cell, jitter)
+
+        # Attraction, d^2 / k along each edge
+        if len(pairs):
+            a, b = pairs[:, 0], pairs[:, 1]
+            delta = pos[a] - pos[b]
+            pull = delta * np.hypot(delta[:, 0], delta[:, 1])[:, None]
+            for axis in (0, 1):
+                disp[:, axis] += np.bincount(b, pull[:, axis], n) - np.bincount(a, pull[:, axis], n)
+
+        # Gravity keeps disconnected pieces from drifting apart, then cap the step
+        force = disp - GRAVITY * pos
+        length = np.hypot(force[:, 0], force[:, 1])
+        scale = np.where(length > temperature, temperature / np.maximum(length, 1e-12), 1.0)
+        pos += force * scale[:, None]
+
+    return {node_id: (round(x, 3), round(y, 3)) for node_id, (x, y) in zip(ids, pos.tolist())}
+
+
+def _repulsion(pos: np.ndarray, cell: float, jitter: np.random.Generator) -> np.ndarray:
+    """Repulsion, k^2 / d, from the nodes in each node's own and adjacent grid cells."""
+    n = len(pos)
+    disp = np.zeros_like(pos)
+    grid = np.floor(pos / cell).astype(np.int64)
+    grid -= grid.min(axis=0) - 1  # one empty cell of margin, so neighbor keys can't wrap
+    width = int(grid[:, 1].max()) + 2
+    key = grid[:, 0] * width + grid[:, 1]
+    order = np.argsort(key, kind="stable")
+    cells, first, inverse, counts = np.unique(key[order], return_index=True, return_inverse=True, return_counts=True)
+    member_cell = np.empty(n, dtype=np.int64)
+    member_cell[order] = inverse
+    sums = np.column_stack([np.bincount(member_cell, pos[:, axis], len(cells)) for axis in (0, 1)])
+    bulk = counts > CELL_EXACT
+    # Members of each sparse cell, padded to CELL_EXACT with -1
+    slot = np.arange(n) - first[inverse]
+    sparse = ~bulk[inverse]
+    slots = np.full((len(cells), CELL_EXACT), -1, dtype=np.int64)
+    slots[inverse[sparse], slot[sparse]] = order[sparse]
+    slot_pos = pos[slots]
+
+    for ox in (-1, 0, 1):
+        for oy in (-1, 0, 1):
+            # Neighbor cell of each cell, then of each node
+            target = cells + ox * width + oy
+            found = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+            found[cells[found] != target] = -1
+            c = found[member_cell]
+
+            # Crowded cells act as one body at their centroid
+            i = np.flatnonzero((c >= 0) & bulk[c])
+            if len(i):
+                total, count = sums[c[i]], counts[c[i]].astype(float)
+                if ox == oy == 0:
+                    total, count = total - pos[i], count - 1
+                delta = pos[i] - total / count[:, None]
+                d2 = np.einsum("ij,ij->i", delta, delta)
+                d2[d2 == 0] = 1e-4
+                disp[i] += delta * (count / d2)[:, None]
+
+            # Sparse cells push node by node
+            i = np.flatnonzero((c >= 0) & ~bulk[c])
+            if not len(i):
+                continue
+            members = slots[c[i]]
+            delta = pos[i][:, None, :] - slot_pos[c[i]]
+            d2 = np.einsum("ijk,ijk->ij", delta, delta)
+            real = members >= 0
+            close = (d2 < 1e-8) & real & (members != i[:, None])
+            if close.any():
+                delta[close] = jitter.uniform(-0.01, 0.01, (int(close.sum()), 2))
+                d2[close] = 1e-4
+            # A node's pair with itself has delta 0, so it adds nothing
+            weight = np.where(real & (d2 < cell * cell), 1 / np.where(d2 > 0, d2, 1.0), 0.0)
+            disp[i] += np.einsum("ijk,ij->ik", delta, weight)
+    return disp
+
+
+def compute(version: int, ids: list[str], edges: list[tuple[str, str]], links: list[tuple[str, str]]) -> GraphMetrics:
+    notes = [node_id for node_id in ids if ":" not in node_id]
+    return GraphMetrics(
+        version=version,
+        positions=layout(ids, edges, _latest.positions if _latest else None),
+        pagerank={k: round(v, 8) for k, v in pagerank(notes, links).items()},
+        components=components(notes, links),
+    )
+
+
+def refresh() -> bool:
+    """Recompute the metrics if the graph's structure changed since the last run."""
+    global _latest
+    with Session(engine) as session:
+        with graph_cache.current(session) as g:
+            version = g.structure
+            if _latest is not None and _latest.version == version:
+                return False
+            snapshot = _snapshot(g)
+    _latest = compute(version, *snapshot)
+    return True
+
+
+async def run_layout() -> None:
+    """Keep the layout and metrics current, at most one run per throttle window."""
+    changed = asyncio.Event()
+
+    def on_event(kind: str, data: Any) -> None:
+        if kind == "change" and any(c["entity"] in GRAPH_TABLES for c in data["changes"]):
+            changed.set()
+
+    bus.add_listener(on_event)
+    while True:
+        changed.clear()
+        started = time.monotonic()
+        try:
+            ran = await asyncio.to_thread(refresh)
+        except Exception:
+            logger.exception("Graph layout failed")
+            ran = True
+        if ran:
+            # Changes arriving meanwhile leave `changed` set and are handled in one run
+            await asyncio.sleep(max(LAYOUT_MIN_INTERVAL, (time.monotonic() - started) * LAYOUT_IDLE_FACTOR))
+        with suppress(TimeoutError):
+            await asyncio.wait_for(changed.wait(), LAYOUT_POLL_SECONDS)
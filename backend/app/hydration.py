@@ -0,0 +1,98 @@
+"""Batched hydration of NoteResponse objects.
+
+List endpoints used to run a tag query and two subtask COUNT queries per row.
+These helpers load the same data for a whole page in a fixed number of
+grouped queries and assemble the responses from in-memory maps.
+"""
+import json
+from collections.abc import Iterable, Sequence
+from typing import Optional
+
+from sqlalchemy import Row, func
+from sqlmodel import Session, col, select
+
+from app.counters import load_counts
+from app.models import Note, NoteTag, Tag
+from app.schemas import NoteResponse, NoteSummary, RecurrenceRule, TagBrief
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+PREVIEW_LENGTH = 160
+
+# Every notes column except the markdown body
+SUMMARY_COLUMNS = [c for c in Note.__table__.columns if c.name != "content"]  # type: ignore[attr-defined]
+
+
+def _chunks(ids: Sequence[str]) -> Iterable[Sequence[str]]:
+    for i in range(0, len(ids), CHUNK_SIZE):
+        yield ids[i:i + CHUNK_SIZE]
+
+
+def parse_recurrence_rule(raw: Optional[str]) -> Optional[RecurrenceRule]:
+    if not raw:
+        return None
+    try:
+        return RecurrenceRule(**json.loads(raw))
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+
+def load_tags(note_ids: Sequence[str], session: Session) -> dict[str, list[TagBrief]]:
+    """Return {note_id: [TagBrief, ...]} for all given notes."""
+    result: dict[str, list[TagBrief]] = {}
+    for chunk in _chunks(note_ids):
+        rows = session.exec(
+            select(NoteTag.note_id, Tag.id, Tag.name, Tag.color)
+            .join(Tag, Tag.id == NoteTag.tag_id)
+            .where(col(NoteTag.note_id).in_(chunk))
+            .order_by(Tag.name)
+        ).all()
+        for note_id, tag_id, name, color in rows:
+            result.setdefault(note_id, []).append(TagBrief(id=tag_id, name=name, color=color))
+    return result
+
+
+def load_subtask_counts(note_ids: Sequence[str], session: Session) -> dict[str, tuple[int, int]]:
+    """Return {note_id: (total, completed)} for notes that have subtasks."""
+    return load_counts("subtask", note_ids, session)
+
+
+def _hydrate(model: type, records: list[dict], session: Session) -> list:
+    ids = [r["id"] for r in records]
+    tags = load_tags(ids, session)
+    counts = load_subtask_counts(ids, session)
+
+    result = []
+    for data in records:
+        data["recurrence_rule"] = parse_recurrence_rule(data.get("recurrence_rule"))
+        subtask_count, subtask_completed = counts.get(data["id"], (0, 0))
+        result.append(model(
+            **data,
+            tags=tags.get(data["id"], []),
+            subtask_count=subtask_count,
+            subtask_completed=subtask_completed,
+        ))
+    return result
+
+
+def note_responses(notes: Sequence[Note], session: Session) -> list[NoteResponse]:
+    """Build NoteResponses for a page of notes with grouped tag/subtask queries."""
+    if not notes:
+        return []
+    return _hydrate(NoteResponse, [n.model_dump() for n in notes], session)
+
+
+def note_response(note: Note, session: Session) -> NoteResponse:
+    return note_responses([note], session)[0]
+
+
+def summary_select():
+    """SELECT of metadata columns plus a preview cut in SQL, never the full body."""
+    return select(*SUMMARY_COLUMNS, func.substr(Note.content, 1, PREVIEW_LENGTH).label("preview"))
+
+
+def note_summaries(rows: Sequence[Row], session: Session) -> list[NoteSummary]:
+    """Build NoteSummaries for rows produced by summary_select()."""
+    if not rows:
+        return []
+    return _hydrate(NoteSummary, [r._asdict() for r in rows], session)
@@ -0,0 +1,185 @@
+"""Incremental [[wiki-link]] resolution.
+
+Link targets match note titles case-insensitively on `lower(trim(title))`, which
+the idx_notes_title_key expression index serves. Targets with no matching note
+are parked in unresolved_links and linked in bulk once a note with that title is
+created or renamed.
+
+complete_titles serves [[ and palette autocomplete from the same title key
+index plus the title-only notes_titles FTS table.
+"""
+import json
+import re
+import string
+from collections.abc import Iterable
+
+from sqlalchemy import delete, func, insert, text
+from sqlmodel import Session, col, select
+
+from app.events import record_changes
+from app.models import Note, NoteLink, UnresolvedLink
+
+WIKILINK_RE = re.compile(r"\[\[([^\]]+)\]\]")
+_WORD_RE = re.compile(r"\w+")
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_TITLE_KEY = func.lower(func.trim(Note.title))
+
+
+def title_key(title: str) -> str:
+    """Python twin of SQLite's lower(trim(title)), which only folds ASCII."""
+    return title.strip(" ").translate(_ASCII_LOWER)
+
+
+def link_keys(content: str) -> set[str]:
+    return {key for key in map(title_key, WIKILINK_RE.findall(content)) if key}
+
+
+def resolve_titles(keys: Iterable[str], session: Session) -> dict[str, str]:
+    """Map title keys to the oldest live note carrying that title, in one query."""
+    keys = [k for k in keys if k]
+    if not keys:
+        return {}
+    return dict(session.exec(
+        select(_TITLE_KEY, func.min(Note.id))
+        .where(_TITLE_KEY.in_(keys), Note.is_trashed == False)  # noqa: E712
+        .group_by(_TITLE_KEY)
+    ).all())
+
+
+def _link(pairs: list[tuple[str, str]], session: Session) -> None:
+    if pairs:
+        session.exec(
+            insert(NoteLink).prefix_with("OR IGNORE"),
+            params=[{"source_id": s, "target_id": t} for s, t in pairs],
+        )
+        record_changes(session, "note_links", [f"{s}:{t}" for s, t in pairs])
+
+
+def _park(pairs: list[tuple[str, str]], session: Session) -> None:
+    if pairs:
+        session.exec(
+            insert(UnresolvedLink).prefix_with("OR IGNORE"),
+            params=[{"source_id": s, "title_key": k} for s, k in pairs],
+        )
+
+
+def sync_links(note_id: str, content: str, session: Session) -> None:
+    """Bring a note's outgoing links in line with the [[titles]] in its content."""
+    keys = link_keys(content)
+    resolved = resolve_titles(keys, session)
+    targets = set(resolved.values()) - {note_id}  # self-links are dropped
+    unresolved = keys - resolved.keys()
+
+    current = set(session.exec(select(NoteLink.target_id).where(NoteLink.source_id == note_id)).all())
+    if stale := current - targets:
+        session.exec(
+            delete(NoteLink).where(NoteLink.source_id == note_id, col(NoteLink.target_id).in_(stale))
+        )
+        record_changes(session, "note_links", [f"{note_id}:{t}" for t in stale], "delete")
+    _link([(note_id, t) for t in targets - current], session)
+
+    parked = set(session.exec(select(UnresolvedLink.title_key).where(UnresolvedLink.source_id == note_id)).all())
+    if stale := parked - unresolved:
+        session.exec(
+            delete(UnresolvedLink).where(UnresolvedLink.source_id == note_id, col(UnresolvedLink.title_key).in_(stale))
+        )
+    _park([(note_id, k) for k in unresolved - parked], session)
+
+
+def resolve_pending(note_id: str, title: str, session: Session) -> None:
+    """Link every note waiting on `title` to the note that now carries it."""
+    key = title_key(title)
+    if not key:
+        return
+    sources = session.exec(
+        delete(UnresolvedLink)
+        .where(UnresolvedLink.title_key == key, UnresolvedLink.source_id != note_id)
+        .returning(UnresolvedLink.source_id)
+    ).all()
+    _link([(source_id, note_id) for (source_id,) in sources], session)
+
+
+def release_links(old_keys: dict[str, str], session: Session) -> None:
+    """Re-resolve links into notes that lost their title (renamed or deleted).
+
+    `old_keys` maps note id -> the title key other notes linked to it by. Each
+    incoming link moves to another note with that title, or back to
+    unresolved_links if there is none.
+    """
+    rows = session.exec(
+        delete(NoteLink)
+        .where(col(NoteLink.target_id).in_(list(old_keys)))
+        .returning(NoteLink.source_id, NoteLink.target_id)
+    ).all()
+    if not rows:
+        return
+    record_changes(session, "note_links", [f"{s}:{t}" for s, t in rows], "delete")
+
+    resolved = resolve_titles({old_keys[t] for _, t in rows}, session)
+    links, parked = [], []
+    for source_id, target_id in rows:
+        key = old_keys[target_id]
+        if not key:
+            continue
+        if key not in resolved:
+            parked.append((source_id, key))
+        elif resolved[key] != source_id:
+            links.append((source_id, resolved[key]))
+    _link(links, session)
+    _park(parked, session)
+
+
+def retitle(note_id: str, old_title: str, new_title: str, session: Session) -> None:
+    """Move links after a note's title changes."""
+    old_key, new_key = title_key(old_title), title_key(new_title)
+    if old_key == new_key:
+        return
+    if old_key:
+        release_links({note_id: old_key}, session)
+    resolve_pending(note_id, new_title, session)
+
+
+def forget_notes(deleted: dict[str, str], session: Session) -> None:
+    """Drop links of hard-deleted notes (id -> title); links into them become unresolved."""
+    if not deleted:
+        return
+    ids = list(deleted)
+    gone = session.exec(
+        delete(NoteLink).where(col(NoteLink.source_id).in_(ids)).returning(NoteLink.source_id, NoteLink.target_id)
+    ).all()
+    record_changes(session, "note_links", [f"{s}:{t}" for s, t in gone], "delete")
+    session.exec(delete(UnresolvedLink).where(col(UnresolvedLink.source_id).in_(ids)))
+    release_links({note_id: title_key(title) for note_id, title in deleted.items()}, session)
+
+
+_COMPLETE_COLUMNS = "SELECT n.id, n.title, n.folder_id, f.name FROM notes n LEFT JOIN folders f ON f.id = n.folder_id"
+
+
+def complete_titles(prefix: str, limit: int, session: Session) -> list[tuple]:
+    """(id, title, folder_id, folder_name) of live notes matching a typed prefix.
+
+    Titles that start with the prefix come first, in key order straight off
+    idx_notes_title_key. Remaining slots go to titles with a word starting with
+    it (the last word of the prefix may be partial), best bm25 first.
+    """
+    key = title_key(prefix)
+    if not key:
+        return []
+    rows = session.exec(text(
+        f"{_COMPLETE_COLUMNS}"
+        " WHERE lower(trim(n.title)) >= :key AND lower(trim(n.title)) < :key || char(1114111)"
+        " AND +n.is_trashed = 0"  # unary + keeps the planner on the title index
+        " ORDER BY lower(trim(n.title)) LIMIT :limit"
+    ).bindparams(key=key, limit=limit)).all()
+
+    words = _WORD_RE.findall(prefix)
+    if len(rows) < limit and words:
+        match = " ".join(f'"{w}"' for w in words) + "*"
+        rows += session.exec(text(
+            f"{_COMPLETE_COLUMNS} JOIN notes_titles ON notes_titles.rowid = n.rowid"
+            " WHERE notes_titles MATCH :match AND n.is_trashed = 0"
+            " AND n.id NOT IN (SELECT value FROM json_each(:seen))"
+            " ORDER BY notes_titles.rank LIMIT :limit"
+        ).bindparams(match=match, seen=json.dumps([r[0] for r in rows]), limit=limit - len(rows))).all()
+    return rows
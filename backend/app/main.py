@@ -1,16 +1,50 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app import duplicates, graph_layout, related
 from app.database import init_db
-from app.routers import attachments, daily, export, finance, folders, graph, notes, projects, reminders, search, tags
+from app.events import bus
+from app.extraction import run_extractor
+from app.routers import (
+    attachments,
+    daily,
+    events,
+    export,
+    finance,
+    folders,
+    graph,
+    notes,
+    projects,
+    reminders,
+    search,
+    sidebar,
+    sync,
+    tags,
+)
+from app.versions import run_pruner
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    bus.bind(asyncio.get_running_loop())
+    tasks = [
+        asyncio.create_task(reminders.run_scheduler()),
+        asyncio.create_task(run_pruner()),
+        asyncio.create_task(run_extractor()),
+        asyncio.create_task(related.run_indexer()),
+        asyncio.create_task(duplicates.run_indexer()),
+        asyncio.create_task(graph_layout.run_layout()),
+    ]
     yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
 
 
 app = FastAPI(title="Every Note", version="0.1.0", lifespan=lifespan)
@@ -34,6 +68,9 @@ app.include_router(graph.router)
 app.include_router(attachments.router)
 app.include_router(reminders.router)
 app.include_router(finance.router)
+app.include_router(sync.router)
+app.include_router(events.router)
+app.include_router(sidebar.router)
 
 
 @app.get("/health")
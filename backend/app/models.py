@@ -25,6 +25,13 @@ class NoteLink(SQLModel, table=True):
     target_id: str = Field(foreign_key="notes.id", primary_key=True)
 
 
+class UnresolvedLink(SQLModel, table=True):
+    """A [[title]] in a note's content that no note carries yet."""
+    __tablename__ = "unresolved_links"
+    source_id: str = Field(foreign_key="notes.id", primary_key=True)
+    title_key: str = Field(primary_key=True)  # lower(trim(title))
+
+
 class Tag(SQLModel, table=True):
     __tablename__ = "tags"
     id: str = Field(default_factory=generate_ulid, primary_key=True)
@@ -120,12 +127,33 @@ class Attachment(SQLModel, table=True):
     created_at: str = Field(default_factory=utc_now)
 
 
+class AttachmentText(SQLModel, table=True):
+    """Extraction outcome per attachment; the text itself lives in attachments_fts."""
+    __tablename__ = "attachment_text"
+    attachment_id: str = Field(foreign_key="attachments.id", primary_key=True)
+    status: str  # "done" | "unsupported" | "failed"
+    error: Optional[str] = Field(default=None)
+    chars: int = Field(default=0)
+    extracted_at: str = Field(default_factory=utc_now)
+
+
 class NoteVersion(SQLModel, table=True):
     __tablename__ = "note_versions"
     id: str = Field(default_factory=generate_ulid, primary_key=True)
     note_id: str = Field(foreign_key="notes.id", index=True)
     title: str = Field(default="")
-    content: str = Field(default="")
+    content: str = Field(default="")  # full text only for legacy rows; see app.versions
+    base_id: Optional[str] = Field(default=None)  # NULL for keyframes
+    delta: Optional[bytes] = Field(default=None)  # zlib: keyframe text or diff against base
+    depth: int = Field(default=0)  # deltas since the last keyframe
+    created_at: str = Field(default_factory=utc_now)
+
+
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+    key: str = Field(primary_key=True)
+    request_hash: str
+    response: str  # JSON body returned the first time
     created_at: str = Field(default_factory=utc_now)
 
 
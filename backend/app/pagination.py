@@ -0,0 +1,53 @@
+"""Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row on a page, JSON-encoded and wrapped in
+urlsafe base64. It holds values rather than a row id, so the next page stays
+correct even if that row is edited or deleted in the meantime.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+
+# Pseudo-type for decode_cursor: a string holding an ISO 8601 timestamp
+ISO_DATETIME = "iso-datetime"
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _matches(value, expected) -> bool:
+    if expected == ISO_DATETIME:
+        try:
+            datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return False
+        return True
+    # bool is an int subclass; only accept it where asked for
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str, size: int, types: Optional[tuple] = None) -> list:
+    """Decode a cursor produced by encode_cursor, expecting `size` values.
+
+    `types` optionally gives the expected type of each value (a type, a tuple
+    of types, or ISO_DATETIME), so a tampered cursor fails with 400 instead of
+    reaching the query.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(400, "Invalid cursor")
+    if types is not None and not all(_matches(v, t) for v, t in zip(values, types)):
+        raise HTTPException(400, "Invalid cursor")
+    return values
@@ -0,0 +1,77 @@
+"""Time budgets and cancellation for long-running read queries.
+
+A QueryBudget installs an SQLite progress handler on the session's connection.
+SQLite calls the handler every few thousand VM instructions, and the running
+statement is interrupted once the deadline passes or the budget is cancelled.
+Budgets registered under a client id are cancelled when the same client starts
+a newer query, so type-ahead bursts don't queue up behind stale searches.
+"""
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+# VM instructions between progress handler calls
+PROGRESS_STEPS = 1000
+
+_inflight: dict[str, "QueryBudget"] = {}
+_inflight_lock = threading.Lock()
+
+
+class QueryBudget:
+    """Interrupt the session's queries after `seconds` or on cancel().
+
+    Use as a context manager around the queries; `reason` is "timeout" or
+    "cancelled" once a query has been (or would be) interrupted.
+    """
+
+    def __init__(self, session: Session, seconds: float, client: Optional[str] = None) -> None:
+        self.session = session
+        self.seconds = seconds
+        self.client = client
+        self.deadline = 0.0
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._conn = None
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def extend(self, seconds: float) -> None:
+        """Give a follow-up query its own allowance after a timeout."""
+        if not self._cancelled.is_set():
+            self.reason = None
+            self.deadline = time.monotonic() + seconds
+
+    def _progress(self) -> int:
+        if self._cancelled.is_set():
+            self.reason = "cancelled"
+        elif time.monotonic() > self.deadline:
+            self.reason = "timeout"
+        return 1 if self.reason else 0
+
+    def interrupted(self, exc: Exception) -> bool:
+        """Whether `exc` came from this budget stopping a query."""
+        return self.reason is not None and isinstance(exc, OperationalError) and "interrupted" in str(exc)
+
+    def __enter__(self) -> "QueryBudget":
+        if self.client:
+            with _inflight_lock:
+                previous = _inflight.get(self.client)
+                if previous is not None:
+                    previous.cancel()
+                _inflight[self.client] = self
+        self.deadline = time.monotonic() + self.seconds
+        self._conn = self.session.connection().connection.driver_connection
+        self._conn.set_progress_handler(self._progress, PROGRESS_STEPS)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        # Pooled connections outlive the request: never leave the handler behind
+        self._conn.set_progress_handler(None, PROGRESS_STEPS)
+        if self.client:
+            with _inflight_lock:
+                if _inflight.get(self.client) is self:
+                    del _inflight[self.client]
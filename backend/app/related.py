@@ -0,0 +1,205 @@
+"""Related-note recommendations from a TF-IDF index kept in SQLite.
+
+note_terms is the sparse term-document matrix: one row per (term, note) with a
+sublinear tf weight, 1 + ln(tf). term_stats holds document frequencies, kept
+in step by triggers, and note_vectors the TF-IDF norm of each note together
+with the corpus size it was computed at and a hash of the text it was built from.
+
+A background indexer follows the sync_changes log (see app/changes.py), so
+the index catches up incrementally after edits and after a restart. A lookup
+reads the postings of the note's strongest terms, one indexed join, and sums
+their products with numpy instead of scanning the corpus. Norms use the idf
+current when a note was indexed; once the corpus has grown or shrunk by a
+quarter since then, the indexer recomputes them in the background.
+"""
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.changes import advance_cursor, follow_notes, note_changes_after
+from app.database import engine
+
+INDEX_BATCH = 200
+# Only the note's highest weighted terms are matched against the corpus
+QUERY_TERMS = 32
+
+_TOKEN_RE = re.compile(r"[^\W\d_]{3,40}")
+STOPWORDS = frozenset("""
+    about after also and any are because been before being but can could did does each for from had has
+    have her here him his how into its just like more most not now only other our out over she should
+    some such than that the their them then there these they this those through too under very was
+    were what when where which while who will with would you your
+""".split())
+
+
+def term_counts(title: str, content: str) -> Counter:
+    words = _TOKEN_RE.findall(f"{title}\n{content}".lower())
+    return Counter(w for w in words if w not in STOPWORDS)
+
+
+def _idf(df: int, n: int) -> float:
+    return math.log((n + 1) / (df + 1)) + 1
+
+
+def _content_hash(title: str, content: str) -> str:
+    return hashlib.sha1(f"{title}\0{content}".encode()).hexdigest()
+
+
+def _doc_freqs(session: Session, terms: list[str]) -> dict[str, int]:
+    rows = session.exec(
+        text("SELECT term, df FROM term_stats WHERE term IN (SELECT value FROM json_each(:terms))")
+        .bindparams(terms=json.dumps(terms))
+    ).all()
+    return dict(rows)
+
+
+def _corpus_size(session: Session) -> int:
+    return session.exec(text("SELECT COUNT(*) FROM note_vectors")).one()[0]
+
+
+def _drop(session: Session, note_ids: list[str]) -> None:
+    ids = json.dumps(note_ids)
+    session.exec(text("DELETE FROM note_terms WHERE note_id IN (SELECT value FROM json_each(:ids))").bindparams(ids=ids))
+    session.exec(text("DELETE FROM note_vectors WHERE note_id IN (SELECT value FROM json_each(:ids))").bindparams(ids=ids))
+
+
+def _norms(session: Session, weights: dict[str, dict[str, float]], n: int) -> dict[str, float]:
+    """TF-IDF vector norms for {note_id: {term: weight}} in a corpus of n notes."""
+    dfs = _doc_freqs(session, list({t for terms in weights.values() for t in terms}))
+    return {
+        note_id: math.sqrt(sum((w * _idf(dfs.get(t, 1), n)) ** 2 for t, w in terms.items()))
+        for note_id, terms in weights.items()
+    }
+
+
+def index_notes(session: Session, note_ids: list[str]) -> int:
+    """(Re)index the given notes, dropping ones that no longer exist. Returns notes rebuilt."""
+    ids = json.dumps(note_ids)
+    notes = session.exec(
+        text("SELECT id, title, content FROM notes WHERE id IN (SELECT value FROM json_each(:ids))").bindparams(ids=ids)
+    ).all()
+    hashes = dict(session.exec(
+        text("SELECT note_id, content_hash FROM note_vectors WHERE note_id IN (SELECT value FROM json_each(:ids))")
+        .bindparams(ids=ids)
+    ).all())
+
+    weights: dict[str, dict[str, float]] = {}
+    digests: dict[str, str] = {}
+    for note_id, title, content in notes:
+        digest = _content_hash(title, content)
+        if hashes.get(note_id) != digest:  # otherwise only metadata changed
+            counts = term_counts(title, content)
+            weights[note_id] = {term: 1 + math.log(tf) for term, tf in counts.items()}
+            digests[note_id] = digest
+
+    _drop(session, list(set(note_ids) - {n[0] for n in notes}) + list(weights))
+    postings = [{"term": t, "id": note_id, "weight": w} for note_id, terms in weights.items() for t, w in terms.items()]
+    if postings:
+        session.exec(text("INSERT INTO note_terms (term, note_id, weight) VALUES (:term, :id, :weight)"), params=postings)
+    n = _corpus_size(session) + len(weights)
+    rows = [
+        {"id": note_id, "norm": norm, "n": n, "hash": digests[note_id]}
+        for note_id, norm in _norms(session, weights, n).items()
+    ]
+    if rows:
+        session.exec(
+            text("INSERT INTO note_vectors (note_id, norm, corpus_size, content_hash) VALUES (:id, :norm, :n, :hash)"),
+            params=rows,
+        )
+    return len(weights)
+
+
+def renormalize(session: Session, batch: int = INDEX_BATCH) -> int:
+    """Refresh norms computed when the corpus was much smaller, so idf shifts don't skew scores."""
+    n = _corpus_size(session)
+    stale = [row[0] for row in session.exec(
+        text("SELECT note_id FROM note_vectors WHERE corpus_size < :floor OR corpus_size > :ceil LIMIT :limit")
+        .bindparams(floor=n * 0.8, ceil=n * 1.25, limit=batch)
+    ).all()]
+    if not stale:
+        return 0
+    weights: dict[str, dict[str, float]] = {note_id: {} for note_id in stale}
+    for note_id, term, weight in session.exec(
+        text("SELECT note_id, term, weight FROM note_terms WHERE note_id IN (SELECT value FROM json_each(:ids))")
+        .bindparams(ids=json.dumps(stale))
+    ).all():
+        weights[note_id][term] = weight
+    session.exec(
+        text("UPDATE note_vectors SET norm = :norm, corpus_size = :n WHERE note_id = :id"),
+        params=[{"id": note_id, "norm": norm, "n": n} for note_id, norm in _norms(session, weights, n).items()],
+    )
+    return len(stale)
+
+
+def catch_up(session: Session, batch: int = INDEX_BATCH) -> bool:
+    """Index notes changed since the stored cursor, one batch. Returns True if more remain."""
+    note_ids, seq = note_changes_after(session, "related", batch)
+    if seq is None:
+        more = renormalize(session, batch) > 0
+        session.commit()
+        return more
+    index_notes(session, note_ids)
+    advance_cursor(session, "related", seq)
+    session.commit()
+    return True
+
+
+def related_notes(session: Session, title: str, content: str, note_id: str, limit: int) -> list[tuple[str, str, float]]:
+    """(id, title, cosine similarity) of the live notes closest to the given text."""
+    counts = term_counts(title, content)
+    if not counts:
+        return []
+    n = max(_corpus_size(session), 1)
+    dfs = _doc_freqs(session, list(counts))
+    weights = {t: (1 + math.log(tf)) * _idf(dfs.get(t, 0), n) for t, tf in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+
+    # Terms no other note contains can't contribute; keep the strongest of the rest
+    indexed = session.exec(text("SELECT 1 FROM note_vectors WHERE note_id = :id").bindparams(id=note_id)).first()
+    own = 1 if indexed else 0
+    shared = sorted((t for t in weights if dfs.get(t, 0) > own), key=weights.__getitem__, reverse=True)[:QUERY_TERMS]
+    if not shared:
+        return []
+    # Each postings weight is multiplied by idf once more: the corpus side's tf-idf
+    query = [weights[t] * _idf(dfs[t], n) / norm for t in shared]
+    # One row per query term with its postings packed into strings, so few rows
+    # leave SQLite; CROSS JOIN keeps it starting from the postings, not a scan
+    # of live notes
+    rows = session.exec(text(
+        "SELECT q.key, group_concat(nt.note_id, ' '), group_concat(nt.weight / v.norm, ' ')"
+        " FROM json_each(:terms) q"
+        " CROSS JOIN note_terms nt ON nt.term = q.value"
+        " CROSS JOIN note_vectors v ON v.note_id = nt.note_id"
+        " CROSS JOIN notes n ON n.id = nt.note_id"
+        " WHERE nt.note_id != :id AND n.is_trashed = 0 AND v.norm > 0"
+        " GROUP BY q.key"
+    ).bindparams(terms=json.dumps(shared), id=note_id)).all()
+    if not rows:
+        return []
+    note_ids = np.concatenate([np.array(packed.split()) for _, packed, _ in rows])
+    products = np.concatenate([np.array(packed.split(), dtype=float) * query[key] for key, _, packed in rows])
+    ids, inverse = np.unique(note_ids, return_inverse=True)
+    scores = np.bincount(inverse, products, len(ids))
+    top = np.argsort(-scores, kind="stable")[:limit]
+    best = [(str(ids[i]), float(scores[i])) for i in top]
+    titles = dict(session.exec(
+        text("SELECT id, title FROM notes WHERE id IN (SELECT value FROM json_each(:ids))")
+        .bindparams(ids=json.dumps([id_ for id_, _ in best]))
+    ).all())
+    return [(id_, titles[id_], round(score, 4)) for id_, score in best if id_ in titles]
+
+
+def _catch_up() -> bool:
+    with Session(engine) as session:
+        return catch_up(session)
+
+
+async def run_indexer() -> None:
+    """Keep the related-notes index current, waking shortly after notes change."""
+    await follow_notes(_catch_up, "Related-notes")
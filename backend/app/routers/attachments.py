@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile
 from fastapi.responses import FileResponse
 from sqlmodel import Session, select
 
+from app import extraction
 from app.database import get_session
 from app.models import Attachment, Note, generate_ulid
 from app.schemas import AttachmentResponse
@@ -13,7 +14,7 @@ from app.schemas import AttachmentResponse
 router = APIRouter(tags=["attachments"])
 S = Annotated[Session, Depends(get_session)]
 
-ATTACHMENTS_DIR = "data/attachments"
+ATTACHMENTS_DIR = extraction.ATTACHMENTS_DIR
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
 ALLOWED_MIME_TYPES = {
@@ -81,6 +82,7 @@ async def upload_attachment(note_id: str, file: UploadFile, session: S):
     session.add(attachment)
     session.commit()
     session.refresh(attachment)
+    extraction.notify()
     return _attachment_response(attachment)
 
 
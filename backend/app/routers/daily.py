@@ -1,32 +1,25 @@
 from datetime import date
-from typing import Annotated
+from typing import Annotated, Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select, or_
 
 from app.database import get_session
-from app.models import Note, NoteTag, Tag, generate_ulid, utc_now
-from app.schemas import NoteResponse, TagBrief
+from app.hydration import note_response, note_responses, note_summaries, summary_select
+from app.links import resolve_pending
+from app.models import Note, generate_ulid
+from app.schemas import NoteResponse, NoteSummary
 
 router = APIRouter(prefix="/daily", tags=["daily"])
 S = Annotated[Session, Depends(get_session)]
 
 
-def _note_response(note: Note, session: Session) -> NoteResponse:
-    tags = session.exec(
-        select(Tag).join(NoteTag).where(NoteTag.note_id == note.id)
-    ).all()
-    return NoteResponse(
-        **note.model_dump(),
-        tags=[TagBrief(id=t.id, name=t.name, color=t.color) for t in tags],
-    )
-
-
-@router.get("/range", response_model=list[NoteResponse])
+@router.get("/range", response_model=list[NoteResponse] | list[NoteSummary])
 def get_range(
     session: S,
     start: str = Query(..., description="Start date YYYY-MM-DD"),
     end: str = Query(..., description="End date YYYY-MM-DD"),
+    fields: Literal["full", "summary"] = "full",
 ):
     """Return notes for calendar: daily notes by daily_date, others by due_at."""
     try:
@@ -36,7 +29,7 @@ def get_range(
         raise HTTPException(400, "Invalid date format. Use YYYY-MM-DD")
 
     notes = session.exec(
-        select(Note)
+        (select(Note) if fields == "full" else summary_select())
         .where(
             Note.is_trashed == False,  # noqa: E712
             or_(
@@ -47,7 +40,9 @@ def get_range(
         .order_by(Note.updated_at.desc())  # type: ignore[union-attr]
     ).all()
 
-    return [_note_response(n, session) for n in notes]
+    if fields == "summary":
+        return note_summaries(notes, session)
+    return note_responses(notes, session)
 
 
 @router.get("", response_model=NoteResponse)
@@ -72,7 +67,7 @@ def _get_or_create(date_str: str, session: Session) -> NoteResponse:
     ).first()
 
     if note:
-        return _note_response(note, session)
+        return note_response(note, session)
 
     # Parse the date for a nice title
     d = date.fromisoformat(date_str)
@@ -86,6 +81,8 @@ def _get_or_create(date_str: str, session: Session) -> NoteResponse:
         daily_date=date_str,
     )
     session.add(note)
+    session.flush()
+    resolve_pending(note.id, note.title, session)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
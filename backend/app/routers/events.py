@@ -0,0 +1,45 @@
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from app.events import bus, format_sse
+
+router = APIRouter(tags=["events"])
+
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """Server-sent events: data changes, due reminders and due summaries.
+
+    Event types:
+      change   {"changes": [{"entity": "notes", "id": "...", "op": "upsert"|"delete"}]}
+      reminder ReminderWithNote, once when it comes due
+      summary  ScheduledSummaryFired, when its cron schedule fires
+      resync   events were dropped for this client; refetch everything
+    """
+    sub = bus.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    kind, data = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if sub.overflowed:
+                    sub.overflowed = False
+                    yield format_sse("resync", {})
+                yield format_sse(kind, data)
+        finally:
+            bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,10 +2,11 @@ from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import text
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select
 
+from app.counters import note_counts
 from app.database import get_session
-from app.models import Folder, Note, generate_ulid, utc_now
+from app.models import Folder, generate_ulid, utc_now
 from app.schemas import FolderCreate, FolderResponse, FolderTree, FolderUpdate, ReorderRequest
 
 router = APIRouter(prefix="/folders", tags=["folders"])
@@ -16,28 +17,17 @@ S = Annotated[Session, Depends(get_session)]
 def list_folders(session: S, parent_id: Optional[str] = None):
     query = select(Folder).where(Folder.parent_id == parent_id).order_by(Folder.position)
     folders = session.exec(query).all()
+    counts = note_counts("folder", [f.id for f in folders], session)
+    return [FolderResponse(**f.model_dump(), note_count=counts.get(f.id, 0)) for f in folders]
 
-    result = []
-    for f in folders:
-        count = session.exec(
-            select(func.count()).select_from(Note).where(
-                Note.folder_id == f.id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-            )
-        ).one()
-        result.append(FolderResponse(**f.model_dump(), note_count=count))
-    return result
 
-
-@router.get("/tree", response_model=list[FolderTree])
-def get_folder_tree(session: S):
-    """Return full folder tree using recursive CTE."""
+def build_folder_tree(session: Session) -> list[FolderTree]:
+    """Assemble the folder tree from one query, with direct and subtree note counts."""
     rows = session.exec(text("""
-        WITH RECURSIVE tree AS (
-            SELECT f.id, f.name, f.icon, f.parent_id, f.position,
-                   (SELECT COUNT(*) FROM notes n WHERE n.folder_id = f.id AND n.is_trashed = 0 AND n.is_completed = 0) as note_count
-            FROM folders f
-        )
-        SELECT * FROM tree ORDER BY position
+        SELECT f.id, f.name, f.icon, f.parent_id, f.position, COALESCE(c.total, 0)
+        FROM folders f
+        LEFT JOIN note_counts c ON c.kind = 'folder' AND c.id = f.id
+        ORDER BY f.position
     """)).all()
 
     folder_map: dict[str, FolderTree] = {}
@@ -46,7 +36,7 @@ def get_folder_tree(session: S):
     for row in rows:
         node = FolderTree(
             id=row[0], name=row[1], icon=row[2], parent_id=row[3],
-            position=row[4], note_count=row[5], children=[],
+            position=row[4], note_count=row[5], total_count=row[5], children=[],
         )
         folder_map[node.id] = node
 
@@ -56,19 +46,32 @@ def get_folder_tree(session: S):
         else:
             roots.append(node)
 
+    # Roll counts up from the leaves: walk top-down, then add in reverse
+    order: list[FolderTree] = []
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.children)
+    for node in reversed(order):
+        if node.parent_id in folder_map:
+            folder_map[node.parent_id].total_count += node.total_count
+
     return roots
 
 
+@router.get("/tree", response_model=list[FolderTree])
+def get_folder_tree(session: S):
+    """Return the full folder tree."""
+    return build_folder_tree(session)
+
+
 @router.get("/{folder_id}", response_model=FolderResponse)
 def get_folder(folder_id: str, session: S):
     folder = session.get(Folder, folder_id)
     if not folder:
         raise HTTPException(404, "Folder not found")
-    count = session.exec(
-        select(func.count()).select_from(Note).where(
-            Note.folder_id == folder_id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-        )
-    ).one()
+    count = note_counts("folder", [folder_id], session).get(folder_id, 0)
     return FolderResponse(**folder.model_dump(), note_count=count)
 
 
@@ -101,11 +104,7 @@ def update_folder(folder_id: str, data: FolderUpdate, session: S):
     session.commit()
     session.refresh(folder)
 
-    count = session.exec(
-        select(func.count()).select_from(Note).where(
-            Note.folder_id == folder_id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-        )
-    ).one()
+    count = note_counts("folder", [folder_id], session).get(folder_id, 0)
     return FolderResponse(**folder.model_dump(), note_count=count)
 
 
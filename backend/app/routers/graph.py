@@ -1,65 +1,310 @@
-from typing import Annotated
+import zlib
+from collections.abc import Iterable
+from typing import Annotated, Literal, Optional
 
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlmodel import Session
 
+from app import graph_binary, graph_layout
+from app.changes import changes_since
 from app.database import get_session
-from app.models import Note, NoteLink, NoteTag
-from app.schemas import GraphData, GraphEdge, GraphNode
+from app.graph_cache import GraphCache, graph_cache
+from app.schemas import GraphData, GraphDiff, GraphEdge, GraphNode
 
 router = APIRouter(prefix="/graph", tags=["graph"])
 S = Annotated[Session, Depends(get_session)]
 
+EdgeType = Literal["link", "tag", "folder"]
+GraphMode = Literal["pairwise", "groups"]
+EDGE_TYPES: list[EdgeType] = ["link", "tag", "folder"]
+
+# More changes than this and a diff is no cheaper than the full graph
+DIFF_LIMIT = 5000
+
+# Serialized /graph bodies per (mode, types, binary), tagged with the graph's
+# `changed` seq and layout version, alongside their deflated form
+_rendered: dict[tuple[str, tuple[str, ...], bool], tuple[tuple[int, int], bytes, Optional[bytes]]] = {}
+# Bodies smaller than this aren't worth deflating
+COMPRESS_MIN_BYTES = 1024
+
+
+def _accepted(header: Optional[str], value: str) -> bool:
+    """Whether an Accept or Accept-Encoding header lists `value` with a non-zero q."""
+    for part in (header or "").split(","):
+        name, *params = (p.strip() for p in part.split(";"))
+        if name.lower() != value:
+            continue
+        for param in params:
+            key, _, q = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(q) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _pairwise(groups: dict[str, list[str]], kind: str, edges: list[GraphEdge]) -> None:
+    """One edge per pair of notes sharing a group: quadratic in the group size."""
+    seen: set[tuple[str, str]] = set()
+    for members in groups.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pair = (min(a, b), max(a, b))
+                if pair not in seen:
+                    seen.add(pair)
+                    edges.append(GraphEdge(source=pair[0], target=pair[1], type=kind))
+
+
+def _group_node(kind: str, group_id: str, names: dict[str, str]) -> GraphNode:
+    return GraphNode(id=f"{kind}:{group_id}", title=names.get(group_id, ""), folder_id=None, kind=kind)
 
-@router.get("", response_model=GraphData)
-def get_graph(session: S):
-    """Return all nodes and edges for the graph view."""
-    notes = session.exec(
-        select(Note).where(Note.is_trashed == False)  # noqa: E712
-    ).all()
 
-    if not notes:
-        return GraphData(nodes=[], edges=[])
+def _membership(
+    groups: dict[str, list[str]], names: dict[str, str], kind: str, nodes: list[GraphNode], edges: list[GraphEdge]
+) -> None:
+    """One node per group and one edge per member: linear in the number of notes."""
+    for group_id, members in groups.items():
+        node = _group_node(kind, group_id, names)
+        nodes.append(node)
+        edges.extend(GraphEdge(source=note_id, target=node.id, type=kind) for note_id in members)
 
-    nodes = [GraphNode(id=n.id, title=n.title or "Untitled", folder_id=n.folder_id) for n in notes]
-    note_ids = {n.id for n in notes}
+
+def _note_node(g: GraphCache, note_id: str) -> GraphNode:
+    title, folder_id = g.notes[note_id]
+    return GraphNode(id=note_id, title=title, folder_id=folder_id)
+
+
+def _with_metrics(nodes: list[GraphNode], metrics: Optional[graph_layout.GraphMetrics]) -> list[GraphNode]:
+    if metrics:
+        for node in nodes:
+            if position := metrics.positions.get(node.id):
+                node.x, node.y = position
+            node.pagerank = metrics.pagerank.get(node.id)
+            node.component = metrics.components.get(node.id)
+    return nodes
+
+
+def build_graph(
+    g: GraphCache, mode: str, types: list[str], metrics: Optional[graph_layout.GraphMetrics] = None
+) -> GraphData:
+    nodes = [_note_node(g, note_id) for note_id in g.notes]
     edges: list[GraphEdge] = []
 
     # Wiki-link edges
-    links = session.exec(select(NoteLink)).all()
-    for link in links:
-        if link.source_id in note_ids and link.target_id in note_ids:
-            edges.append(GraphEdge(source=link.source_id, target=link.target_id, type="link"))
-
-    # Shared-tag edges (notes sharing any tag)
-    note_tags = session.exec(select(NoteTag)).all()
-    tag_to_notes: dict[str, list[str]] = {}
-    for nt in note_tags:
-        if nt.note_id in note_ids:
-            tag_to_notes.setdefault(nt.tag_id, []).append(nt.note_id)
-
-    seen_tag_edges: set[tuple[str, str]] = set()
-    for tag_notes in tag_to_notes.values():
-        for i, a in enumerate(tag_notes):
-            for b in tag_notes[i + 1:]:
-                pair = (min(a, b), max(a, b))
-                if pair not in seen_tag_edges:
-                    seen_tag_edges.add(pair)
-                    edges.append(GraphEdge(source=pair[0], target=pair[1], type="tag"))
-
-    # Same-folder edges
-    folder_to_notes: dict[str, list[str]] = {}
-    for n in notes:
-        if n.folder_id:
-            folder_to_notes.setdefault(n.folder_id, []).append(n.id)
-
-    seen_folder_edges: set[tuple[str, str]] = set()
-    for folder_notes in folder_to_notes.values():
-        for i, a in enumerate(folder_notes):
-            for b in folder_notes[i + 1:]:
-                pair = (min(a, b), max(a, b))
-                if pair not in seen_folder_edges:
-                    seen_folder_edges.add(pair)
-                    edges.append(GraphEdge(source=pair[0], target=pair[1], type="folder"))
+    if "link" in types:
+        edges.extend(GraphEdge(source=s, target=t, type="link") for s, t in g.live_links())
+
+    # Shared-tag and same-folder edges
+    for kind, groups, names in [
+        ("tag", g.tag_groups, g.tag_names),
+        ("folder", g.folder_groups, g.folder_names),
+    ]:
+        if kind in types:
+            if mode == "groups":
+                _membership(groups(), names, kind, nodes, edges)
+            else:
+                _pairwise(groups(), kind, edges)
+
+    return GraphData(
+        nodes=_with_metrics(nodes, metrics),
+        edges=edges,
+        version=g.version,
+        layout_version=metrics.version if metrics else None,
+    )
+
+
+@router.get("", response_model=GraphData)
+def get_graph(
+    session: S,
+    mode: GraphMode = "pairwise",
+    types: list[EdgeType] = Query(EDGE_TYPES),
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Return all nodes and edges for the graph view.
+
+    mode=pairwise connects every two notes that share a tag or folder, which
+    grows quadratically with group size. mode=groups adds one node per tag and
+    folder (id "tag:<id>" / "folder:<id>", kind "tag" / "folder") with an edge
+    from each member note, so the payload stays linear. `types` limits which
+    edge types are built, e.g. ?types=link for wiki-links only.
+
+    The graph is served from an incrementally maintained in-memory copy.
+    Responses carry an ETag; sending it back in If-None-Match returns 304 while
+    the graph is unchanged. `version` can be passed to /graph/changes.
+
+    Nodes carry positions, PageRank and component numbers precomputed in the
+    background (app/graph_layout.py); `layout_version` says which graph version
+    they belong to, and nodes added since have none yet.
+
+    Accept: application/vnd.every-note.graph selects the compact columnar
+    encoding in app/graph_binary.py; with Accept-Encoding: deflate, large
+    bodies are sent compressed.
+    """
+    binary = _accepted(accept, graph_binary.MEDIA_TYPE)
+    deflate = _accepted(accept_encoding, "deflate")
+    key = (mode, tuple(sorted(set(types))), binary)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    metrics = graph_layout.latest()
+    with graph_cache.current(session) as g:
+        stamp = (g.changed, metrics.version if metrics else -1)
+        tag = f"{stamp[0]}.{stamp[1]}-{mode}-{'+'.join(key[1])}{'-bin' if binary else ''}"
+        cached = _rendered.get(key)
+        if cached is None or cached[0] != stamp:
+            data = build_graph(g, mode, types, metrics)
+            body = graph_binary.encode_graph(data) if binary else data.model_dump_json().encode()
+            cached = (stamp, body, zlib.compress(body, 6) if len(body) >= COMPRESS_MIN_BYTES else None)
+            _rendered[key] = cached
+    body = cached[1]
+    if deflate and cached[2] is not None:
+        body, tag = cached[2], tag + "-z"
+        headers["Content-Encoding"] = "deflate"
+    headers["ETag"] = etag = f'"{tag}"'
+    if if_none_match and (if_none_match.strip() == "*" or etag in map(str.strip, if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    media_type = graph_binary.MEDIA_TYPE if binary else "application/json"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+@router.get("/neighborhood/{note_id}", response_model=GraphData)
+def get_neighborhood(
+    note_id: str,
+    session: S,
+    response: Response,
+    depth: int = Query(2, ge=1, le=6),
+    limit: int = Query(200, ge=1, le=5000),
+    tags: bool = False,
+):
+    """The notes within `depth` hops of a note, at most `limit` of them.
+
+    Hops follow wiki-links in both directions; with tags=true, notes sharing a
+    tag are one hop apart too, through a tag node as in mode=groups. The walk is
+    breadth-first over the in-memory graph, links before tags, so when the cap
+    is hit the closest notes are the ones kept and X-Graph-Truncated is set.
+    """
+    with graph_cache.current(session) as g:
+        if note_id not in g.notes:
+            raise HTTPException(404, "Note not found")
+        seen = {note_id}
+        order = [note_id]
+        tag_ids: set[str] = set()
+
+        def visit(candidates: Iterable[str]) -> bool:
+            for n in candidates:
+                if n not in seen:
+                    if len(seen) >= limit:
+                        return False
+                    seen.add(n)
+                    order.append(n)
+            return True
+
+        frontier, truncated = [note_id], False
+        for _ in range(depth):
+            start = len(order)
+            complete = all(visit(g.neighbors(n)) for n in frontier)
+            if complete and tags:
+                new_tags = sorted({t for n in frontier for t in g.note_tags.get(n, ())} - tag_ids)
+                for tag_id in new_tags:
+                    tag_ids.add(tag_id)
+                    if not visit(sorted(m for m in g.tag_notes.get(tag_id, ()) if m in g.notes)):
+                        complete = False
+                        break
+            frontier = order[start:]
+            if not complete:
+                truncated = True
+                break
+            if not frontier:
+                break
+
+        metrics = graph_layout.latest()
+        nodes = [_note_node(g, n) for n in order]
+        edges = [GraphEdge(source=s, target=t, type="link") for s, t in g.live_links(seen) if t in seen]
+        for tag_id in sorted(tag_ids):
+            node = _group_node("tag", tag_id, g.tag_names)
+            nodes.append(node)
+            edges.extend(
+                GraphEdge(source=n, target=node.id, type="tag")
+                for n in sorted(g.tag_notes.get(tag_id, set()) & seen)
+            )
+        version = g.version
+    if truncated:
+        response.headers["X-Graph-Truncated"] = "1"
+    return GraphData(
+        nodes=_with_metrics(nodes, metrics),
+        edges=edges,
+        version=version,
+        layout_version=metrics.version if metrics else None,
+    )
+
+
+@router.get("/changes", response_model=GraphDiff)
+def get_graph_changes(
+    session: S,
+    since: int = Query(..., ge=0),
+    types: list[EdgeType] = Query(EDGE_TYPES),
+):
+    """Node and edge changes since a graph `version`, in mode=groups form.
+
+    Drop the `removed` nodes and every edge touching a `removed` or `touched`
+    node, then add `edges` and upsert `nodes`. Pass the returned `version` as
+    `since` next time. `reset` means too much changed: refetch /graph.
+    """
+    with graph_cache.current(session) as g:
+        if since >= g.version:
+            return GraphDiff(version=since)
+        changes = changes_since(session, since, DIFF_LIMIT + 1)
+        if len(changes) > DIFF_LIMIT:
+            return GraphDiff(version=g.version, reset=True)
+        # Only changes the cache has applied; later commits are in the next diff
+        changes = [c for c in changes if c.seq <= g.version]
+        if not changes:
+            return GraphDiff(version=since)
+
+        touched: set[str] = set()
+        removed: list[str] = []
+        nodes: dict[str, GraphNode] = {}
+        groups = {"tag": g.tag_names, "folder": g.folder_names}
+        for c in changes:
+            if c.entity == "note":
+                if c.entity_id in g.notes:
+                    touched.add(c.entity_id)
+                else:
+                    removed.append(c.entity_id)
+            elif c.entity in ("link", "note_tag"):
+                note_id = c.entity_id.partition(":")[0]
+                if note_id in g.notes:
+                    touched.add(note_id)
+            elif c.entity in groups and c.entity in types:
+                if c.entity_id in groups[c.entity]:
+                    node = _group_node(c.entity, c.entity_id, groups[c.entity])
+                    nodes[node.id] = node
+                else:
+                    removed.append(f"{c.entity}:{c.entity_id}")
+
+        edges: set[tuple[str, str, str]] = set()
+        for note_id in touched:
+            nodes[note_id] = _note_node(g, note_id)
+            if "link" in types:
+                edges.update((note_id, t, "link") for t in g.links.get(note_id, ()) if t in g.notes)
+                edges.update((s, note_id, "link") for s in g.backlinks.get(note_id, ()) if s in g.notes)
+            memberships = []
+            if "tag" in types:
+                memberships += [("tag", tag_id) for tag_id in g.note_tags.get(note_id, ())]
+            folder_id = g.notes[note_id][1]
+            if "folder" in types and folder_id:
+                memberships.append(("folder", folder_id))
+            for kind, group_id in memberships:
+                node = _group_node(kind, group_id, groups[kind])
+                nodes.setdefault(node.id, node)
+                edges.add((note_id, node.id, kind))
 
-    return GraphData(nodes=nodes, edges=edges)
+        return GraphDiff(
+            version=changes[-1].seq,
+            nodes=_with_metrics(list(nodes.values()), graph_layout.latest()),
+            removed=removed,
+            touched=sorted(touched),
+            edges=[GraphEdge(source=s, target=t, type=kind) for s, t, kind in sorted(edges)],
+        )
@@ -1,106 +1,118 @@
+import hashlib
 import json
-import re
-from datetime import datetime
-from typing import Annotated, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Literal, Optional
 
 from dateutil.relativedelta import relativedelta
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import and_, case, delete, func, insert, or_, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, select
 
 from app.database import get_session
-from app.models import Note, NoteLink, NoteTag, NoteVersion, Reminder, Tag, generate_ulid, utc_now
+from app.duplicates import find_clusters
+from app.events import record_changes
+from app.hydration import (
+    note_response,
+    note_responses,
+    note_summaries,
+    parse_recurrence_rule,
+    summary_select,
+)
+from app.models import (
+    IdempotencyKey,
+    Note,
+    NoteLink,
+    NoteTag,
+    NoteVersion,
+    Reminder,
+    Tag,
+    generate_ulid,
+    utc_now,
+)
+from app.links import complete_titles, forget_notes, resolve_pending, retitle, sync_links
+from app.pagination import ISO_DATETIME, decode_cursor, encode_cursor
+from app.related import related_notes
 from app.schemas import (
     BacklinkResponse,
+    BulkOperation,
+    BulkOpResult,
+    BulkRequest,
+    BulkResponse,
+    DuplicateCluster,
+    DuplicateNote,
     NoteCreate,
+    NotePage,
     NoteResponse,
+    NoteSummary,
     NoteUpdate,
     NoteVersionBrief,
     NoteVersionResponse,
     RecurrenceRule,
+    RelatedNote,
     ReorderRequest,
-    TagBrief,
+    TitleMatch,
 )
+from app.versions import snapshot, version_content
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 S = Annotated[Session, Depends(get_session)]
+Fields = Literal["full", "summary"]
 
-WIKILINK_RE = re.compile(r"\[\[([^\]]+)\]\]")
+DEFAULT_PAGE_SIZE = 100
 
 
-def _dismiss_pending_reminders(note_id: str, session: Session) -> None:
-    """Auto-dismiss all pending reminders for a note."""
-    pending = session.exec(
-        select(Reminder).where(
-            Reminder.note_id == note_id,
-            Reminder.is_dismissed == False,  # noqa: E712
-        )
+def _dismiss_pending_reminders(note_ids: list[str], session: Session) -> None:
+    """Auto-dismiss all pending reminders for the given notes."""
+    dismissed = session.exec(
+        update(Reminder)
+        .where(col(Reminder.note_id).in_(note_ids), Reminder.is_dismissed == False)  # noqa: E712
+        .values(is_dismissed=True)
+        .returning(Reminder.id)
     ).all()
-    for r in pending:
-        r.is_dismissed = True
-        session.add(r)
-
-
-def _subtask_counts(note_id: str, session: Session) -> tuple[int, int]:
-    """Return (total, completed) subtask counts for a note."""
-    total = session.exec(
-        select(func.count()).where(Note.parent_id == note_id)
-    ).one()
-    completed = session.exec(
-        select(func.count()).where(
-            Note.parent_id == note_id, Note.is_completed == True  # noqa: E712
-        )
-    ).one()
-    return total, completed
-
-
-def _parse_recurrence_rule(raw: Optional[str]) -> Optional[RecurrenceRule]:
-    if not raw:
-        return None
-    try:
-        return RecurrenceRule(**json.loads(raw))
-    except (json.JSONDecodeError, ValueError):
-        return None
+    record_changes(session, "reminders", [r[0] for r in dismissed])
 
 
-def _note_response(note: Note, session: Session) -> NoteResponse:
-    tags = session.exec(
-        select(Tag).join(NoteTag).where(NoteTag.note_id == note.id)
+def _trash_notes(note_ids: list[str], session: Session) -> None:
+    """Soft-delete notes and their subtasks with one UPDATE."""
+    _dismiss_pending_reminders(note_ids, session)
+    trashed = session.exec(
+        update(Note)
+        .where(or_(col(Note.id).in_(note_ids), col(Note.parent_id).in_(note_ids)))
+        .values(is_trashed=True, trashed_at=utc_now())
+        .returning(Note.id)
     ).all()
-    subtask_count, subtask_completed = _subtask_counts(note.id, session)
-    data = note.model_dump()
-    data["recurrence_rule"] = _parse_recurrence_rule(data.get("recurrence_rule"))
-    return NoteResponse(
-        **data,
-        tags=[TagBrief(id=t.id, name=t.name, color=t.color) for t in tags],
-        subtask_count=subtask_count,
-        subtask_completed=subtask_completed,
-    )
+    record_changes(session, "notes", [r[0] for r in trashed])
 
 
-def _sync_note_links(note_id: str, content: str, session: Session) -> None:
-    """Parse [[title]] wiki-links from content and rebuild NoteLink rows."""
-    titles = set(WIKILINK_RE.findall(content))
-    # Delete existing outgoing links
-    existing = session.exec(
-        select(NoteLink).where(NoteLink.source_id == note_id)
+def _restore_notes(note_ids: list[str], session: Session) -> None:
+    """Undo _trash_notes for notes and their subtasks with one UPDATE."""
+    restored = session.exec(
+        update(Note)
+        .where(or_(col(Note.id).in_(note_ids), col(Note.parent_id).in_(note_ids)))
+        .values(is_trashed=False, trashed_at=None)
+        .returning(Note.id, Note.title)
     ).all()
-    for link in existing:
-        session.delete(link)
-
-    if not titles:
-        return
-
-    # Resolve titles to note IDs (case-insensitive)
-    for title in titles:
-        target = session.exec(
-            select(Note).where(Note.title == title, Note.is_trashed == False)  # noqa: E712
-        ).first()
-        if target and target.id != note_id:
-            session.add(NoteLink(source_id=note_id, target_id=target.id))
-
-
-@router.get("", response_model=list[NoteResponse])
+    record_changes(session, "notes", [r[0] for r in restored])
+    # Links written while the notes were in the trash were parked as unresolved
+    for restored_id, title in restored:
+        resolve_pending(restored_id, title, session)
+
+
+def _delete_notes(note_ids: list[str], session: Session) -> None:
+    """Permanently delete notes, their subtasks, tag assignments and links."""
+    _dismiss_pending_reminders(note_ids, session)
+    deleted = dict(session.exec(
+        delete(Note)
+        .where(or_(col(Note.id).in_(note_ids), col(Note.parent_id).in_(note_ids)))
+        .returning(Note.id, Note.title)
+    ).all())
+    session.exec(delete(NoteTag).where(col(NoteTag.note_id).in_(list(deleted))))
+    forget_notes(deleted, session)
+    record_changes(session, "notes", deleted, "delete")
+
+
+@router.get("", response_model=list[NoteResponse] | list[NoteSummary] | NotePage)
 def list_notes(
     session: S,
     folder_id: Optional[str] = None,
@@ -111,8 +123,17 @@ def list_notes(
     parent_id: Optional[str] = None,
     status: Optional[str] = None,
     project_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Fields = "full",
 ):
-    query = select(Note).where(Note.is_trashed == trashed)
+    """List notes, newest first with pinned notes on top.
+
+    Passing `limit` (or a `cursor` from a previous page) switches to keyset
+    pagination and returns a NotePage instead of a plain list.
+    `fields=summary` returns NoteSummary items without the markdown body.
+    """
+    query = (select(Note) if fields == "full" else summary_select()).where(Note.is_trashed == trashed)
 
     # By default, only show top-level notes (no parent)
     if parent_id is not None:
@@ -130,7 +151,7 @@ def list_notes(
         query = query.where(Note.folder_id == folder_id)
 
     if tag_id is not None:
-        query = query.join(NoteTag).where(NoteTag.tag_id == tag_id)
+        query = query.join(NoteTag, NoteTag.note_id == Note.id).where(NoteTag.tag_id == tag_id)
 
     if pinned is True:
         query = query.where(Note.is_pinned == True)  # noqa: E712
@@ -147,9 +168,62 @@ def list_notes(
         # Exclude project tasks from notes views (but show all in trash)
         query = query.where(Note.project_id == None)  # noqa: E711
 
-    query = query.order_by(Note.is_pinned.desc(), Note.updated_at.desc())  # type: ignore[union-attr]
-    notes = session.exec(query).all()
-    return [_note_response(n, session) for n in notes]
+    # id breaks ties between notes saved in the same millisecond
+    query = query.order_by(
+        Note.is_pinned.desc(), Note.updated_at.desc(), Note.id.desc()  # type: ignore[union-attr]
+    )
+
+    hydrate = note_responses if fields == "full" else note_summaries
+
+    if limit is None and cursor is None:
+        notes = session.exec(query).all()
+        return hydrate(notes, session)
+
+    if cursor is not None:
+        pinned_key, updated_key, id_key = decode_cursor(cursor, 3, ((bool, int), ISO_DATETIME, str))
+        query = query.where(
+            tuple_(Note.is_pinned, Note.updated_at, Note.id) < tuple_(pinned_key, updated_key, id_key)
+        )
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    notes = session.exec(query.limit(page_size + 1)).all()
+    next_cursor = None
+    if len(notes) > page_size:
+        notes = notes[:page_size]
+        last = notes[-1]
+        next_cursor = encode_cursor([int(last.is_pinned), last.updated_at, last.id])
+    return NotePage(items=hydrate(notes, session), next_cursor=next_cursor)
+
+
+@router.get("/duplicates", response_model=list[DuplicateCluster])
+def list_duplicates(session: S, threshold: float = Query(0.8, ge=0.3, le=1.0)):
+    """Clusters of near-duplicate notes, largest first.
+
+    Similarity is the estimated Jaccard similarity of the notes' word 3-grams,
+    from MinHash signatures kept by a background indexer.
+    """
+    clusters = find_clusters(session, threshold)
+    ids = [note_id for note_ids, _ in clusters for note_id in note_ids]
+    notes = {n.id: n for n in session.exec(select(Note).where(col(Note.id).in_(ids))).all()}
+    return [
+        DuplicateCluster(
+            notes=[DuplicateNote(id=i, title=notes[i].title, updated_at=notes[i].updated_at) for i in note_ids],
+            similarity=sim,
+        )
+        for note_ids, sim in clusters
+    ]
+
+
+@router.get("/titles/complete", response_model=list[TitleMatch])
+def complete_note_titles(
+    session: S,
+    prefix: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Title autocomplete for [[links]] and the command palette."""
+    rows = complete_titles(prefix, limit, session)
+    return [TitleMatch(id=id_, title=title, folder_id=folder_id, folder_name=folder_name)
+            for id_, title, folder_id, folder_name in rows]
 
 
 @router.get("/{note_id}", response_model=NoteResponse)
@@ -157,7 +231,7 @@ def get_note(note_id: str, session: S):
     note = session.get(Note, note_id)
     if not note:
         raise HTTPException(404, "Note not found")
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 @router.post("", response_model=NoteResponse, status_code=201)
@@ -186,18 +260,16 @@ def create_note(data: NoteCreate, session: S):
     )
     session.add(note)
     session.flush()
-    _sync_note_links(note.id, note.content, session)
+    sync_links(note.id, note.content, session)
+    resolve_pending(note.id, note.title, session)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
-
+    return note_response(note, session)
 
-@router.patch("/{note_id}", response_model=NoteResponse)
-def update_note(note_id: str, data: NoteUpdate, session: S):
-    note = session.get(Note, note_id)
-    if not note:
-        raise HTTPException(404, "Note not found")
 
+def _apply_update(note: Note, data: NoteUpdate, session: Session) -> None:
+    """Validate and apply a PATCH to a loaded note (no commit)."""
+    note_id = note.id
     update_data = data.model_dump(exclude_unset=True)
 
     # Validate parent_id changes (convert to subtask / promote to note)
@@ -224,31 +296,37 @@ def update_note(note_id: str, data: NoteUpdate, session: S):
 
     # Snapshot previous state before applying changes (version history)
     if content_or_title_changed:
-        version = NoteVersion(
-            id=generate_ulid(),
-            note_id=note_id,
-            title=note.title,
-            content=note.content,
-        )
-        session.add(version)
+        snapshot(note_id, note.title, note.content, session)
 
     # Serialize recurrence_rule to JSON string for storage
     if "recurrence_rule" in update_data:
         rule = update_data["recurrence_rule"]
         update_data["recurrence_rule"] = json.dumps(rule) if rule else None
 
+    old_title = note.title
     for key, value in update_data.items():
         setattr(note, key, value)
     note.updated_at = utc_now()
 
-    # Re-sync wiki-links if content changed
+    # Update wiki-links in both directions
     if "content" in update_data:
-        _sync_note_links(note_id, note.content, session)
+        sync_links(note_id, note.content, session)
+    if "title" in update_data:
+        retitle(note_id, old_title, note.title, session)
 
     session.add(note)
+
+
+@router.patch("/{note_id}", response_model=NoteResponse)
+def update_note(note_id: str, data: NoteUpdate, session: S):
+    note = session.get(Note, note_id)
+    if not note:
+        raise HTTPException(404, "Note not found")
+
+    _apply_update(note, data, session)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 @router.delete("/{note_id}")
@@ -257,25 +335,10 @@ def trash_note(note_id: str, session: S, permanent: bool = False):
     if not note:
         raise HTTPException(404, "Note not found")
 
-    # Cascade to subtasks
-    subtasks = session.exec(select(Note).where(Note.parent_id == note_id)).all()
-
-    _dismiss_pending_reminders(note_id, session)
-
     if permanent:
-        for sub in subtasks:
-            session.delete(sub)
-        session.delete(note)
+        _delete_notes([note_id], session)
     else:
-        now = utc_now()
-        for sub in subtasks:
-            sub.is_trashed = True
-            sub.trashed_at = now
-            session.add(sub)
-        note.is_trashed = True
-        note.trashed_at = now
-        session.add(note)
-
+        _trash_notes([note_id], session)
     session.commit()
     return {"ok": True}
 
@@ -286,20 +349,10 @@ def restore_note(note_id: str, session: S):
     if not note:
         raise HTTPException(404, "Note not found")
 
-    note.is_trashed = False
-    note.trashed_at = None
-    session.add(note)
-
-    # Cascade restore to subtasks
-    subtasks = session.exec(select(Note).where(Note.parent_id == note_id)).all()
-    for sub in subtasks:
-        sub.is_trashed = False
-        sub.trashed_at = None
-        session.add(sub)
-
+    _restore_notes([note_id], session)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 def _advance_due_date(due_at: Optional[str], rule: RecurrenceRule) -> str:
@@ -323,22 +376,17 @@ def _advance_due_date(due_at: Optional[str], rule: RecurrenceRule) -> str:
     return next_date.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
 
 
-@router.post("/{note_id}/complete", response_model=NoteResponse)
-def complete_note(note_id: str, session: S):
-    note = session.get(Note, note_id)
-    if not note:
-        raise HTTPException(404, "Note not found")
-
+def _complete(note: Note, session: Session) -> None:
+    """Mark a note completed and spawn its next occurrence if it recurs (no commit)."""
     note.is_completed = True
     note.completed_at = utc_now()
     if note.status:
         note.status = "done"
-    _dismiss_pending_reminders(note_id, session)
+    _dismiss_pending_reminders([note.id], session)
     session.add(note)
 
     # Generate next occurrence for recurring notes
-    next_note = None
-    rule = _parse_recurrence_rule(note.recurrence_rule)
+    rule = parse_recurrence_rule(note.recurrence_rule)
     if rule:
         # Clone tags before flush
         tag_ids = [t.id for t in session.exec(
@@ -364,9 +412,17 @@ def complete_note(note_id: str, session: S):
         for tag_id in tag_ids:
             session.add(NoteTag(note_id=next_note.id, tag_id=tag_id))
 
+
+@router.post("/{note_id}/complete", response_model=NoteResponse)
+def complete_note(note_id: str, session: S):
+    note = session.get(Note, note_id)
+    if not note:
+        raise HTTPException(404, "Note not found")
+
+    _complete(note, session)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 @router.delete("/{note_id}/recurrence", response_model=NoteResponse)
@@ -381,7 +437,7 @@ def remove_recurrence(note_id: str, session: S):
     session.add(note)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 @router.post("/{note_id}/uncomplete", response_model=NoteResponse)
@@ -397,7 +453,7 @@ def uncomplete_note(note_id: str, session: S):
     session.add(note)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 @router.patch("/{note_id}/status", response_model=NoteResponse)
@@ -411,7 +467,7 @@ def update_status(note_id: str, data: dict, session: S):
     session.add(note)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 @router.post("/{note_id}/tags/{tag_id}")
@@ -467,7 +523,7 @@ def get_version(note_id: str, version_id: str, session: S):
         id=version.id,
         note_id=version.note_id,
         title=version.title,
-        content=version.content,
+        content=version_content(version, session),
         created_at=version.created_at,
     )
 
@@ -481,24 +537,22 @@ def restore_version(note_id: str, version_id: str, session: S):
     if not version or version.note_id != note_id:
         raise HTTPException(404, "Version not found")
 
-    # Save current state as a version before restoring
-    snapshot = NoteVersion(
-        id=generate_ulid(),
-        note_id=note_id,
-        title=note.title,
-        content=note.content,
-    )
-    session.add(snapshot)
+    restored_content = version_content(version, session)
 
+    # Save current state as a version before restoring, so the restore can be undone
+    snapshot(note_id, note.title, note.content, session, coalesce=False)
+
+    old_title = note.title
     note.title = version.title
-    note.content = version.content
+    note.content = restored_content
     note.updated_at = utc_now()
-    _sync_note_links(note_id, note.content, session)
+    sync_links(note_id, note.content, session)
+    retitle(note_id, old_title, note.title, session)
 
     session.add(note)
     session.commit()
     session.refresh(note)
-    return _note_response(note, session)
+    return note_response(note, session)
 
 
 # --- Backlinks ---
@@ -517,19 +571,203 @@ def get_backlinks(note_id: str, session: S):
     return [BacklinkResponse(id=n.id, title=n.title, updated_at=n.updated_at) for n in sources]
 
 
+# --- Related ---
+
+@router.get("/{note_id}/related", response_model=list[RelatedNote])
+def get_related(note_id: str, session: S, limit: int = Query(10, ge=1, le=50)):
+    """Notes with the most similar wording, by TF-IDF cosine similarity."""
+    note = session.get(Note, note_id)
+    if not note:
+        raise HTTPException(404, "Note not found")
+    rows = related_notes(session, note.title, note.content, note_id, limit)
+    return [RelatedNote(id=id_, title=title, score=score) for id_, title, score in rows]
+
+
 # --- Subtasks ---
 
-@router.get("/{note_id}/subtasks", response_model=list[NoteResponse])
-def list_subtasks(note_id: str, session: S):
+@router.get("/{note_id}/subtasks", response_model=list[NoteResponse] | list[NoteSummary])
+def list_subtasks(note_id: str, session: S, fields: Fields = "full"):
     note = session.get(Note, note_id)
     if not note:
         raise HTTPException(404, "Note not found")
     subtasks = session.exec(
-        select(Note)
+        (select(Note) if fields == "full" else summary_select())
         .where(Note.parent_id == note_id, Note.is_trashed == False)  # noqa: E712
         .order_by(Note.position, Note.created_at)
     ).all()
-    return [_note_response(s, session) for s in subtasks]
+    if fields == "summary":
+        return note_summaries(subtasks, session)
+    return note_responses(subtasks, session)
+
+
+# --- Bulk ---
+
+# NoteUpdate fields that can be applied with a plain UPDATE (no versions, links or validation)
+SIMPLE_UPDATE_FIELDS = {"folder_id", "position", "is_pinned", "due_at", "note_type", "is_completed", "status", "project_id"}
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+
+def _run_key(op: BulkOperation) -> str:
+    """Consecutive operations with the same key are applied as one statement."""
+    if op.op == "update":
+        payload = op.data.model_dump(exclude_unset=True) if op.data else {}
+        if payload and payload.keys() <= SIMPLE_UPDATE_FIELDS:
+            return "update:" + json.dumps(payload, sort_keys=True)
+        return "update-one:" + op.note_id
+    return op.op
+
+
+def _apply_run(kind: str, ops: list[BulkOperation], notes: dict[str, Note], session: Session) -> None:
+    """Apply a run of same-kind operations with set-based SQL."""
+    ids = list(dict.fromkeys(op.note_id for op in ops))
+    session.flush()
+
+    if kind == "trash":
+        _trash_notes(ids, session)
+    elif kind == "restore":
+        _restore_notes(ids, session)
+    elif kind == "delete":
+        _delete_notes(ids, session)
+    elif kind == "complete":
+        recurring = set(session.exec(
+            select(Note.id).where(col(Note.id).in_(ids), Note.recurrence_rule != None)  # noqa: E711
+        ).all())
+        for note_id in recurring:
+            _complete(notes[note_id], session)
+        plain = [i for i in ids if i not in recurring]
+        if plain:
+            session.exec(
+                update(Note)
+                .where(col(Note.id).in_(plain))
+                .values(
+                    is_completed=True,
+                    completed_at=utc_now(),
+                    status=case((and_(Note.status != None, Note.status != ""), "done"), else_=Note.status),  # noqa: E711
+                )
+            )
+            _dismiss_pending_reminders(plain, session)
+            record_changes(session, "notes", plain)
+    elif kind == "uncomplete":
+        session.exec(
+            update(Note)
+            .where(col(Note.id).in_(ids))
+            .values(
+                is_completed=False,
+                completed_at=None,
+                status=case((Note.status == "done", "todo"), else_=Note.status),
+            )
+        )
+        record_changes(session, "notes", ids)
+    elif kind == "add_tag":
+        pairs = list(dict.fromkeys((op.note_id, op.tag_id) for op in ops))
+        session.exec(
+            insert(NoteTag).prefix_with("OR IGNORE").values([{"note_id": n, "tag_id": t} for n, t in pairs])
+        )
+        record_changes(session, "note_tags", [f"{n}:{t}" for n, t in pairs])
+    elif kind == "remove_tag":
+        pairs = list(dict.fromkeys((op.note_id, op.tag_id) for op in ops))
+        session.exec(delete(NoteTag).where(tuple_(NoteTag.note_id, NoteTag.tag_id).in_(pairs)))
+        record_changes(session, "note_tags", [f"{n}:{t}" for n, t in pairs], "delete")
+    elif kind.startswith("update:"):
+        values = json.loads(kind.removeprefix("update:"))
+        session.exec(update(Note).where(col(Note.id).in_(ids)).values(**values, updated_at=utc_now()))
+        record_changes(session, "notes", ids)
+    else:  # "update-one:<id>" needs versions/links/validation
+        _apply_update(notes[ops[0].note_id], ops[0].data, session)
+        session.flush()
+
+    # Raw statements bypass the identity map; reload objects on next access
+    session.expire_all()
+
+
+@router.post("/bulk", response_model=BulkResponse)
+def bulk_notes(
+    data: BulkRequest,
+    session: S,
+    idempotency_key: Optional[str] = Header(None, max_length=200),
+):
+    """Apply many note operations in one transaction.
+
+    Consecutive operations of the same kind run as a single set-based statement.
+    Invalid operations are reported in their result and skipped; the rest commit
+    together. Retrying with the same Idempotency-Key header returns the first
+    response without applying anything again.
+    """
+    request_hash = hashlib.sha256(data.model_dump_json().encode()).hexdigest()
+    if idempotency_key:
+        cutoff = (datetime.now(timezone.utc) - IDEMPOTENCY_TTL).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        session.exec(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+        stored = session.get(IdempotencyKey, idempotency_key)
+        if stored:
+            if stored.request_hash != request_hash:
+                raise HTTPException(422, "Idempotency key was already used for a different request")
+            return BulkResponse.model_validate_json(stored.response)
+
+    ops = data.operations
+    note_ids = list({op.note_id for op in ops})
+    notes = {n.id: n for n in session.exec(select(Note).where(col(Note.id).in_(note_ids))).all()}
+    tag_ids = list({op.tag_id for op in ops if op.tag_id})
+    tags = {t.id: t for t in session.exec(select(Tag).where(col(Tag.id).in_(tag_ids))).all()}
+    # Snapshot what validation needs; runs expire the ORM objects as they go
+    project_of = {n.id: n.project_id for n in notes.values()}
+
+    results: list[BulkOpResult] = []
+    deleted: set[str] = set()
+    run: list[BulkOperation] = []
+    run_kind = ""
+
+    for op in ops:
+        error = None
+        if op.note_id not in notes or op.note_id in deleted:
+            error = "Note not found"
+        elif op.op in ("add_tag", "remove_tag") and not op.tag_id:
+            error = "tag_id is required"
+        elif op.op == "add_tag" and op.tag_id not in tags:
+            error = "Tag not found"
+        elif op.op == "add_tag" and tags[op.tag_id].project_id not in (None, project_of[op.note_id]):
+            error = "Cannot assign project tag to note in different project"
+        elif op.op == "update" and op.data is None:
+            error = "data is required"
+
+        kind = _run_key(op)
+        if error is None and run and kind != run_kind:
+            _apply_run(run_kind, run, notes, session)
+            run = []
+        if error is None:
+            try:
+                if kind.startswith("update-one:"):
+                    _apply_run(kind, [op], notes, session)
+                else:
+                    run.append(op)
+                    run_kind = kind
+            except HTTPException as e:
+                error = e.detail
+        if error is None and op.op == "delete":
+            deleted.add(op.note_id)
+        if error is None and op.op == "update" and "project_id" in op.data.model_fields_set:
+            project_of[op.note_id] = op.data.project_id
+        results.append(BulkOpResult(op=op.op, note_id=op.note_id, ok=error is None, error=error))
+
+    if run:
+        _apply_run(run_kind, run, notes, session)
+
+    response = BulkResponse(results=results)
+    if idempotency_key:
+        session.add(IdempotencyKey(
+            key=idempotency_key, request_hash=request_hash, response=response.model_dump_json(),
+        ))
+    try:
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        # A concurrent retry with the same key won the race; return its response
+        stored = session.get(IdempotencyKey, idempotency_key) if idempotency_key else None
+        if stored is None:
+            raise HTTPException(409, f"Bulk operation violates a constraint: {e.orig}")
+        if stored.request_hash != request_hash:
+            raise HTTPException(409, "Conflicting request with the same idempotency key")
+        return BulkResponse.model_validate_json(stored.response)
+    return response
 
 
 # --- Reorder ---
@@ -1,8 +1,9 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select
 
+from app.counters import note_counts
 from app.database import get_session
 from app.models import Note, Project, generate_ulid, utc_now
 from app.schemas import ProjectCreate, ProjectResponse, ProjectUpdate
@@ -14,15 +15,8 @@ S = Annotated[Session, Depends(get_session)]
 @router.get("", response_model=list[ProjectResponse])
 def list_projects(session: S):
     projects = session.exec(select(Project).order_by(Project.created_at)).all()
-    result = []
-    for p in projects:
-        count = session.exec(
-            select(func.count()).select_from(Note).where(
-                Note.project_id == p.id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-            )
-        ).one()
-        result.append(ProjectResponse(**p.model_dump(), note_count=count))
-    return result
+    counts = note_counts("project", [p.id for p in projects], session)
+    return [ProjectResponse(**p.model_dump(), note_count=counts.get(p.id, 0)) for p in projects]
 
 
 @router.post("", response_model=ProjectResponse, status_code=201)
@@ -54,11 +48,7 @@ def update_project(project_id: str, data: ProjectUpdate, session: S):
     session.commit()
     session.refresh(project)
 
-    count = session.exec(
-        select(func.count()).select_from(Note).where(
-            Note.project_id == project_id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-        )
-    ).one()
+    count = note_counts("project", [project_id], session).get(project_id, 0)
     return ProjectResponse(**project.model_dump(), note_count=count)
 
 
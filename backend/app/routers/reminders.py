@@ -1,17 +1,25 @@
+import asyncio
+import logging
 from datetime import datetime, timezone, timedelta
-from typing import Annotated
+from typing import Annotated, Any, Optional
 
 from croniter import croniter
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select, func
 
-from app.database import get_session
+from app.database import engine, get_session
+from app.events import bus
 from app.models import Note, Reminder, ScheduledSummary, generate_ulid, utc_now
 from app.schemas import ReminderCreate, ReminderResponse, ReminderWithNote, ScheduledSummaryFired
 
 router = APIRouter(tags=["reminders"])
 S = Annotated[Session, Depends(get_session)]
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on scheduler sleeps, so clock jumps and missed wakeups self-heal
+MAX_SLEEP_SECONDS = 60
+
 
 def _reminder_response(r: Reminder) -> ReminderResponse:
     return ReminderResponse(
@@ -35,16 +43,31 @@ def _reminder_with_note(r: Reminder, note_title: str) -> ReminderWithNote:
     )
 
 
+def _parse_ts(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp; values without an offset are taken as UTC."""
+    at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+
+def _format_ts(at: datetime) -> str:
+    """The stored form, matching utc_now(), so remind_at sorts chronologically as text."""
+    return at.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
 @router.post("/notes/{note_id}/reminders", response_model=ReminderResponse, status_code=201)
 def create_reminder(note_id: str, data: ReminderCreate, session: S):
     note = session.get(Note, note_id)
     if not note:
         raise HTTPException(404, "Note not found")
+    try:
+        remind_at = _format_ts(_parse_ts(data.remind_at))
+    except ValueError:
+        raise HTTPException(400, "remind_at must be an ISO 8601 timestamp")
 
     reminder = Reminder(
         id=generate_ulid(),
         note_id=note_id,
-        remind_at=data.remind_at,
+        remind_at=remind_at,
     )
     session.add(reminder)
     session.commit()
@@ -95,9 +118,11 @@ def snooze_reminder(reminder_id: str, data: dict, session: S):
         raise HTTPException(404, "Reminder not found")
 
     minutes = data.get("minutes", 15)
-    current = datetime.fromisoformat(reminder.remind_at.replace("Z", "+00:00"))
-    new_time = current + timedelta(minutes=minutes)
-    reminder.remind_at = new_time.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    try:
+        current = _parse_ts(reminder.remind_at)
+    except ValueError:  # written before remind_at was validated
+        current = datetime.now(timezone.utc)
+    reminder.remind_at = _format_ts(current + timedelta(minutes=minutes))
     reminder.is_fired = False
     reminder.is_dismissed = False
     session.add(reminder)
@@ -139,9 +164,8 @@ def mark_fired(reminder_id: str, session: S):
     return _reminder_response(reminder)
 
 
-@router.get("/reminders/summaries", response_model=list[ScheduledSummaryFired])
-def get_due_summaries(session: S):
-    """Return summaries that should fire now based on cron schedule."""
+def fire_due_summaries(session: Session) -> list[ScheduledSummaryFired]:
+    """Mark summaries whose cron schedule has come due as fired and return them."""
     summaries = session.exec(
         select(ScheduledSummary).where(ScheduledSummary.is_active == True)  # noqa: E712
     ).all()
@@ -183,3 +207,105 @@ def get_due_summaries(session: S):
         ))
 
     return result
+
+
+@router.get("/reminders/summaries", response_model=list[ScheduledSummaryFired])
+def get_due_summaries(session: S):
+    """Return summaries that should fire now based on cron schedule."""
+    return fire_due_summaries(session)
+
+
+# --- Push scheduler ---
+
+def _next_wakeup(session: Session, announced: dict[str, str]) -> tuple[list[ReminderWithNote], Optional[datetime]]:
+    """Return reminders due now (not yet announced) and when the next one is due."""
+    now = datetime.now(timezone.utc)
+    rows = session.exec(
+        select(Reminder, Note.title)
+        .join(Note, Note.id == Reminder.note_id, isouter=True)
+        .where(
+            Reminder.is_fired == False,  # noqa: E712
+            Reminder.is_dismissed == False,  # noqa: E712
+        )
+        .order_by(Reminder.remind_at)
+    ).all()
+
+    # Forget reminders that were fired, dismissed or deleted meanwhile
+    pending_ids = {r.id for r, _ in rows}
+    for reminder_id in list(announced):
+        if reminder_id not in pending_ids:
+            del announced[reminder_id]
+
+    due = []
+    next_at = None
+    for r, title in rows:
+        try:
+            at = _parse_ts(r.remind_at)
+        except ValueError:  # written before remind_at was validated
+            if announced.get(r.id) != r.remind_at:  # warn once, not on every wakeup
+                announced[r.id] = r.remind_at
+                logger.warning("Skipping reminder %s with invalid remind_at %r", r.id, r.remind_at)
+            continue
+        # Rows written before normalisation may be out of order, so no early exit
+        if at > now:
+            if next_at is None or at < next_at:
+                next_at = at
+            continue
+        if announced.get(r.id) != r.remind_at:
+            announced[r.id] = r.remind_at
+            due.append(_reminder_with_note(r, title if title is not None else "Deleted note"))
+
+    # Summaries fire on cron boundaries; wake up for the closest one
+    for cron_expression in session.exec(
+        select(ScheduledSummary.cron_expression).where(ScheduledSummary.is_active == True)  # noqa: E712
+    ).all():
+        at = croniter(cron_expression, now).get_next(datetime)
+        if next_at is None or at < next_at:
+            next_at = at
+    return due, next_at
+
+
+async def run_scheduler() -> None:
+    """Push reminder and summary events to /events subscribers as they come due.
+
+    Sleeps until the next reminder or cron boundary, and wakes early when a
+    reminder or schedule changes. Summaries are only fired while someone is
+    listening, so /reminders/summaries still sees them otherwise.
+    """
+    changed = asyncio.Event()
+    announced: dict[str, str] = {}
+
+    def on_event(kind: str, data: Any) -> None:
+        if kind == "change" and any(
+            c["entity"] in ("reminders", "scheduled_summaries") for c in data["changes"]
+        ):
+            changed.set()
+
+    bus.add_listener(on_event)
+
+    def check() -> tuple[list[ReminderWithNote], list[ScheduledSummaryFired], Optional[datetime]]:
+        with Session(engine) as session:
+            due, next_at = _next_wakeup(session, announced)
+            summaries = fire_due_summaries(session) if bus.has_subscribers else []
+            return due, summaries, next_at
+
+    while True:
+        changed.clear()
+        try:
+            due, summaries, next_at = await asyncio.to_thread(check)
+        except Exception:
+            logger.exception("Reminder scheduler check failed")
+            due, summaries, next_at = [], [], None
+        for reminder in due:
+            bus.publish("reminder", reminder.model_dump())
+        for summary in summaries:
+            bus.publish("summary", summary.model_dump())
+
+        timeout = MAX_SLEEP_SECONDS
+        if next_at is not None:
+            delay = (next_at - datetime.now(timezone.utc)).total_seconds()
+            timeout = min(max(delay, 0.05), MAX_SLEEP_SECONDS)
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -1,14 +1,46 @@
+import os
 import re
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 from sqlmodel import Session
 
+from app.cache import GenerationCache
+from app.changes import current_seq
 from app.database import engine
-from app.schemas import SearchResult
+from app.pagination import ISO_DATETIME, decode_cursor, encode_cursor
+from app.query_budget import QueryBudget
+from app.schemas import SearchCacheStats, SearchFacet, SearchFacets, SearchPage, SearchResult
+from app.search_query import ParsedQuery, parse_query
 
 router = APIRouter(prefix="/search", tags=["search"])
 
+# Keyed on the normalized request; any write to notes or folders clears it
+search_cache = GenerationCache(int(os.getenv("SEARCH_CACHE_SIZE", "512")))
+
+SEARCH_TIME_BUDGET = int(os.getenv("SEARCH_TIME_BUDGET_MS", "250")) / 1000
+
+SearchMode = Literal["word", "substring", "fuzzy"]
+
+# Fuzzy search re-ranks this many trigram candidates by similarity
+FUZZY_CANDIDATES = 200
+# Minimum share of the query's trigrams a note must contain
+FUZZY_THRESHOLD = 0.5
+FUZZY_SNIPPET = 120
+
+# How a result list is ordered; cursors carry it so later pages continue the same way
+FTS, FUZZY, RECENT = "fts", "fuzzy", "recent"
+# Cursor values per strategy: the strategy, then the last row's sort key
+_CURSOR_TYPES = {
+    FTS: (str, (int, float), int),  # bm25 rank, rowid (negated for attachments)
+    FUZZY: (str, (int, float), int),  # negated similarity, rowid
+    RECENT: (str, ISO_DATETIME, int),  # updated_at, rowid
+}
+
+_RESULT_JOINS = " LEFT JOIN folders f ON f.id = n.folder_id LEFT JOIN notes p ON p.id = n.parent_id"
+
 
 def sanitize_fts_query(raw: str) -> str:
     """Sanitize user input for FTS5 MATCH queries.
@@ -22,44 +54,354 @@ def sanitize_fts_query(raw: str) -> str:
     return " ".join(f'"{w}"*' for w in words)
 
 
-@router.get("", response_model=list[SearchResult])
-def search_notes(q: str = Query(..., min_length=1), limit: int = Query(20, le=100)):
-    fts_query = sanitize_fts_query(q)
-    if not fts_query:
+def _normalize(raw: str) -> str:
+    return " ".join(raw.lower().split())
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def trigrams(value: str) -> set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def _filters(parsed: ParsedQuery) -> str:
+    return "".join(f" AND {f}" for f in parsed.filters)
+
+
+def _match_hits(table: str, parsed: ParsedQuery, joins: str = "") -> str:
+    """FROM/WHERE shared by the result query and the facet query."""
+    return (
+        f" FROM {table}"
+        f" JOIN notes n ON n.rowid = {table}.rowid"
+        f"{joins}"
+        f" WHERE {table} MATCH :query"
+        " AND n.is_trashed = 0"
+        f"{_filters(parsed)}"
+    )
+
+
+def _attachment_hits(parsed: ParsedQuery, joins: str = "") -> str:
+    """FROM/WHERE for attachment text matches, filtered by their parent note."""
+    return (
+        " FROM attachments_fts"
+        " JOIN attachments a ON a.rowid = attachments_fts.rowid"
+        " JOIN notes n ON n.id = a.note_id"
+        f"{joins}"
+        " WHERE attachments_fts MATCH :query"
+        " AND n.is_trashed = 0"
+        f"{_filters(parsed)}"
+    )
+
+
+def _search(
+    session: Session,
+    table: str,
+    match: str,
+    parsed: ParsedQuery,
+    limit: int,
+    after: Optional[list] = None,
+    with_content: bool = False,
+    ranked: bool = True,
+) -> list:
+    """Matching rows, best bm25 first. ranked=False returns the first rows found
+    without sorting, which stops early on very broad matches.
+
+    Word searches (notes_fts) also return attachment text matches, one row per
+    attachment under its parent note. Their sort key is the negated attachment
+    rowid, so it never collides with a note's in the keyset.
+    """
+    note = " n.folder_id, f.name as folder_name, n.parent_id, p.title as parent_title"
+    branches = [
+        "SELECT n.id, n.title,"
+        f" snippet({table}, 1, '<mark>', '</mark>', '...', 48) as snippet,"
+        f"{note},"
+        f" bm25({table}, 10.0, 1.0) as rank,"
+        " n.rowid as sort_key,"
+        f"{' n.content,' if with_content else ''}"
+        " NULL as attachment_id, NULL as attachment_name"
+        f"{_match_hits(table, parsed, _RESULT_JOINS)}"
+    ]
+    if table == "notes_fts":
+        branches.append(
+            "SELECT n.id, n.title,"
+            " snippet(attachments_fts, 1, '<mark>', '</mark>', '...', 48),"
+            f"{note},"
+            " bm25(attachments_fts, 10.0, 1.0),"
+            " -a.rowid,"
+            " a.id, a.original_filename"
+            f"{_attachment_hits(parsed, _RESULT_JOINS)}"
+        )
+    keyset = " WHERE (rank, sort_key) > (:after_rank, :after_key)" if after else ""
+    params = {"after_rank": after[0], "after_key": after[1]} if after else {}
+    stmt = text(
+        f"SELECT * FROM ({' UNION ALL '.join(branches)})"
+        f"{keyset}"
+        f"{' ORDER BY rank, sort_key' if ranked else ''}"
+        " LIMIT :limit"
+    ).bindparams(query=match, limit=limit, **params, **parsed.params)
+    return session.exec(stmt).all()
+
+
+def _filter_only(session: Session, parsed: ParsedQuery, limit: int, after: Optional[list] = None) -> list:
+    """Operators without free text: most recently updated matches first."""
+    keyset = " AND (n.updated_at, n.rowid) < (:after_updated, :after_rowid)" if after else ""
+    params = {"after_updated": after[0], "after_rowid": after[1]} if after else {}
+    stmt = text(
+        "SELECT"
+        " n.id,"
+        " n.title,"
+        " substr(n.content, 1, :snippet) as snippet,"
+        " n.folder_id,"
+        " f.name as folder_name,"
+        " n.parent_id,"
+        " p.title as parent_title,"
+        " 0.0 as rank,"
+        " n.rowid,"
+        " n.updated_at"
+        " FROM notes n"
+        f"{_RESULT_JOINS}"
+        " WHERE n.is_trashed = 0"
+        f"{_filters(parsed)}"
+        f"{keyset}"
+        " ORDER BY n.updated_at DESC, n.rowid DESC"
+        " LIMIT :limit"
+    ).bindparams(snippet=FUZZY_SNIPPET, limit=limit, **params, **parsed.params)
+    return session.exec(stmt).all()
+
+
+def _result(row, rank: float, snippet: Optional[str] = None) -> SearchResult:
+    attachment_id = getattr(row, "attachment_id", None)
+    return SearchResult(
+        id=row[0],
+        title=row[1],
+        snippet=row[2] if snippet is None else snippet,
+        folder_id=row[3],
+        folder_name=row[4],
+        parent_id=row[5],
+        parent_title=row[6],
+        rank=rank,
+        attachment_id=attachment_id,
+        attachment_name=row.attachment_name if attachment_id else None,
+    )
+
+
+def _fuzzy(session: Session, query: str, parsed: ParsedQuery, ranked: bool = True) -> list[tuple[float, tuple]]:
+    """Typo-tolerant search: (rank, row) for notes sharing most of the query's trigrams, best first."""
+    grams = trigrams(query)
+    if not grams:
         return []
+    # Any shared trigram makes a candidate; bm25 puts the best overlaps first
+    rows = _search(
+        session, "notes_trigram", " OR ".join(map(_quote, grams)), parsed, FUZZY_CANDIDATES, with_content=True, ranked=ranked
+    )
+
+    scored = []
+    for row in rows:
+        title, content = row[1].lower(), row[9].lower()
+        in_title = sum(g in title for g in grams) / len(grams)
+        in_content = sum(g in content for g in grams) / len(grams)
+        score = max(in_title, 0.8 * in_content)  # title hits count for more
+        if score >= FUZZY_THRESHOLD:
+            scored.append((-score, row))
+    scored.sort(key=lambda item: (item[0], item[1][8]))
+    return scored
+
+
+def _fuzzy_result(rank: float, row) -> SearchResult:
+    # snippet() would highlight scattered trigrams; show the opening text instead
+    content = row[9]
+    return _result(row, rank, content[:FUZZY_SNIPPET] + ("..." if len(content) > FUZZY_SNIPPET else ""))
+
+
+def _facets(session: Session, hits: str, params: dict) -> tuple[int, SearchFacets]:
+    """Total and per folder/tag/project counts over every hit, evaluating `hits` once."""
+    rows = session.exec(text(f"""
+        WITH hits AS MATERIALIZED ({hits})
+        SELECT 'total', NULL, NULL, COUNT(*) FROM hits
+        UNION ALL
+        SELECT 'folder', h.folder_id, f.name, COUNT(*) FROM hits h
+        LEFT JOIN folders f ON f.id = h.folder_id GROUP BY h.folder_id
+        UNION ALL
+        SELECT 'project', h.project_id, pr.name, COUNT(*) FROM hits h
+        LEFT JOIN projects pr ON pr.id = h.project_id GROUP BY h.project_id
+        UNION ALL
+        SELECT 'tag', t.id, t.name, COUNT(*) FROM hits h
+        JOIN note_tags nt ON nt.note_id = h.id JOIN tags t ON t.id = nt.tag_id GROUP BY t.id
+    """).bindparams(**params)).all()
+
+    total = 0
+    groups: dict[str, list[SearchFacet]] = {"folder": [], "tag": [], "project": []}
+    for kind, id_, name, count in rows:
+        if kind == "total":
+            total = count
+        else:
+            groups[kind].append(SearchFacet(id=id_, name=name, count=count))
+    for facets in groups.values():
+        facets.sort(key=lambda f: (-f.count, f.name or ""))
+    return total, SearchFacets(folders=groups["folder"], tags=groups["tag"], projects=groups["project"])
+
+
+def _run(session: Session, strategy: str, mode: str, query: str, parsed: ParsedQuery, limit: int,
+         after: Optional[list], ranked: bool = True) -> tuple[str, list[SearchResult], Optional[list], list]:
+    """Fetch one page: (strategy, items, next cursor key, fuzzy scores)."""
+    table = "notes_fts" if mode == "word" else "notes_trigram"
+    match = query if mode == "word" else _quote(query)
+    items: list[SearchResult] = []
+    next_key = None
+
+    if strategy == RECENT:
+        rows = _filter_only(session, parsed, limit + 1, after)
+        items = [_result(row, row[7]) for row in rows[:limit]]
+        if len(rows) > limit:
+            next_key = [RECENT, rows[limit - 1][9], rows[limit - 1][8]]
+    elif strategy == FTS:
+        rows = _search(session, table, match, parsed, limit + 1, after, ranked=ranked)
+        items = [_result(row, row[7]) for row in rows[:limit]]
+        if len(rows) > limit and ranked:
+            next_key = [FTS, rows[limit - 1][7], rows[limit - 1][8]]
+        if not rows and mode == "substring" and after is None:
+            strategy = FUZZY
+
+    scored: list[tuple[float, tuple]] = []
+    if strategy == FUZZY:
+        scored = _fuzzy(session, query, parsed, ranked)
+        remaining = [s for s in scored if (s[0], s[1][8]) > tuple(after)] if after else scored
+        items = [_fuzzy_result(rank, row) for rank, row in remaining[:limit]]
+        if len(remaining) > limit and ranked:
+            next_key = [FUZZY, remaining[limit - 1][0], remaining[limit - 1][1][8]]
+
+    if not ranked:
+        items.sort(key=lambda item: item.rank)
+    return strategy, items, next_key, scored
+
+
+def _hits(strategy: str, mode: str, query: str, parsed: ParsedQuery, scored: list) -> tuple[str, dict]:
+    """SQL and params selecting every hit of the search, for facet counting."""
+    if strategy == FTS:
+        table = "notes_fts" if mode == "word" else "notes_trigram"
+        match = query if mode == "word" else _quote(query)
+        hits = "SELECT n.id, n.folder_id, n.project_id" + _match_hits(table, parsed)
+        if table == "notes_fts":
+            hits += " UNION ALL SELECT n.id, n.folder_id, n.project_id" + _attachment_hits(parsed)
+        return hits, {"query": match, **parsed.params}
+    if strategy == FUZZY:
+        rowids = "[" + ",".join(str(row[8]) for _, row in scored) + "]"
+        return (
+            "SELECT id, folder_id, project_id FROM notes WHERE rowid IN (SELECT value FROM json_each(:rowids))",
+            {"rowids": rowids},
+        )
+    return "SELECT n.id, n.folder_id, n.project_id FROM notes n WHERE n.is_trashed = 0" + _filters(parsed), parsed.params
+
+
+@router.get("", response_model=list[SearchResult] | SearchPage)
+def search_notes(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    mode: SearchMode = "word",
+    cursor: Optional[str] = None,
+    facets: bool = False,
+    paged: bool = False,
+    client: Optional[str] = Query(None, max_length=64),
+):
+    """Full-text search.
+
+    mode=word matches word prefixes (stemmed). mode=substring finds the text
+    anywhere, e.g. inside identifiers or URLs, and falls back to fuzzy matching
+    when nothing contains it. mode=fuzzy tolerates misspellings. Substring and
+    fuzzy queries need at least 3 characters. Word searches also match the
+    extracted text of attachments; those results carry `attachment_id`.
+
+    The query may also contain filters, applied inside the same SQL statement:
+    tag:, folder:, project:, status:, is:task|checklist|subtask|done|open|
+    pinned|daily|recurring and due:<|<=|>|>=YYYY-MM-DD. Prefix with - to negate.
+
+    Passing `paged`, `facets` or a `cursor` returns a SearchPage; pass its
+    `next_cursor` back as `cursor` for the next page. With facets=true the page
+    also carries the total hit count and counts per folder, tag and project.
+
+    Each search runs within SEARCH_TIME_BUDGET_MS. A query that runs out of
+    time returns the unranked matches found within a second allowance
+    ("partial"), or nothing ("too_broad"). Searches sent with the same `client`
+    id cancel that client's previous in-flight search, which then returns
+    nothing ("cancelled"). The outcome is the page's `status`, and the
+    X-Search-Status header on plain list responses.
+    """
+    parsed = parse_query(q)
+    if mode == "word":
+        query = sanitize_fts_query(parsed.text)
+    else:
+        query = _normalize(parsed.text)
+    page_requested = paged or facets or cursor is not None
+    empty = SearchPage(items=[]) if page_requested else []
+    if (not query and not parsed.filters) or (mode != "word" and 0 < len(query) < 3):
+        return empty
+
+    strategy, after = (FTS if query else RECENT), None
+    if mode == "fuzzy" and query:
+        strategy = FUZZY
+    if cursor is not None:
+        strategy = decode_cursor(cursor, 3)[0]
+        types = _CURSOR_TYPES.get(strategy) if isinstance(strategy, str) else None
+        if types is None:
+            raise HTTPException(400, "Invalid cursor")
+        strategy, *after = decode_cursor(cursor, 3, types)
 
     with Session(engine) as session:
-        stmt = text(
-            "SELECT"
-            " n.id,"
-            " n.title,"
-            " snippet(notes_fts, 1, '<mark>', '</mark>', '...', 48) as snippet,"
-            " n.folder_id,"
-            " f.name as folder_name,"
-            " n.parent_id,"
-            " p.title as parent_title,"
-            " bm25(notes_fts, 10.0, 1.0) as rank"
-            " FROM notes_fts"
-            " JOIN notes n ON n.rowid = notes_fts.rowid"
-            " LEFT JOIN folders f ON f.id = n.folder_id"
-            " LEFT JOIN notes p ON p.id = n.parent_id"
-            " WHERE notes_fts MATCH :query"
-            " AND n.is_trashed = 0"
-            " ORDER BY bm25(notes_fts, 10.0, 1.0)"
-            " LIMIT :limit"
-        ).bindparams(query=fts_query, limit=limit)
-        rows = session.exec(stmt).all()
-
-        return [
-            SearchResult(
-                id=row[0],
-                title=row[1],
-                snippet=row[2],
-                folder_id=row[3],
-                folder_name=row[4],
-                parent_id=row[5],
-                parent_title=row[6],
-                rank=row[7],
-            )
-            for row in rows
-        ]
+        # Read the generation in the same transaction as the query, so a
+        # concurrent write can only make the cached entry look older than it is
+        generation = current_seq(session)
+        key = (mode, " ".join(q.split()), limit, cursor, facets, page_requested)
+        cached = search_cache.get(key, generation)
+        if cached is not None:
+            return cached
+
+        status, next_key, total, facet_counts = "complete", None, None, None
+        with QueryBudget(session, SEARCH_TIME_BUDGET, client) as budget:
+            try:
+                strategy, items, next_key, scored = _run(session, strategy, mode, query, parsed, limit, after)
+                if facets:
+                    total, facet_counts = _facets(session, *_hits(strategy, mode, query, parsed, scored))
+            except OperationalError as exc:
+                if not budget.interrupted(exc):
+                    raise
+                status, items, next_key = budget.reason, [], None
+
+            # Ranking needs every match; settle for the first ones found instead
+            if status == "timeout" and strategy != RECENT and after is None:
+                budget.extend(SEARCH_TIME_BUDGET)
+                try:
+                    items = _run(session, strategy, mode, query, parsed, limit, after, ranked=False)[1]
+                    status = "partial" if items else "too_broad"
+                except OperationalError as exc:
+                    if not budget.interrupted(exc):
+                        raise
+                    status = "too_broad" if budget.reason == "timeout" else budget.reason
+            elif status == "timeout":
+                status = "too_broad"
+
+        if not page_requested:
+            if status == "complete":
+                search_cache.put(key, items, generation)
+            else:
+                response.headers["X-Search-Status"] = status
+            return items
+
+        page = SearchPage(
+            items=items,
+            next_cursor=encode_cursor(next_key) if next_key else None,
+            total=total,
+            facets=facet_counts,
+            status=status,
+        )
+        if status == "complete":
+            search_cache.put(key, page, generation)
+        return page
+
+
+@router.get("/cache", response_model=SearchCacheStats)
+def search_cache_stats():
+    """Hit/miss counters for the search result cache."""
+    return search_cache.stats()
@@ -0,0 +1,27 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+from sqlmodel import Session, select
+
+from app.counters import note_counts
+from app.database import get_session
+from app.models import Project, Tag
+from app.routers.folders import build_folder_tree
+from app.schemas import ProjectResponse, SidebarSnapshot, TagResponse
+
+router = APIRouter(prefix="/sidebar", tags=["sidebar"])
+S = Annotated[Session, Depends(get_session)]
+
+
+@router.get("", response_model=SidebarSnapshot)
+def get_sidebar(session: S):
+    """Folder tree, tags (global and per-project) and projects, with note counts, in one call."""
+    tags = session.exec(select(Tag).order_by(Tag.name)).all()
+    tag_counts = note_counts("tag", [t.id for t in tags], session)
+    projects = session.exec(select(Project).order_by(Project.created_at)).all()
+    project_counts = note_counts("project", [p.id for p in projects], session)
+    return SidebarSnapshot(
+        folders=build_folder_tree(session),
+        tags=[TagResponse(**t.model_dump(), note_count=tag_counts.get(t.id, 0)) for t in tags],
+        projects=[ProjectResponse(**p.model_dump(), note_count=project_counts.get(p.id, 0)) for p in projects],
+    )
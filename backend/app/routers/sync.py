@@ -0,0 +1,89 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session, col, select
+
+from app.changes import changes_since
+from app.counters import note_counts
+from app.database import get_session
+from app.hydration import note_responses
+from app.models import Folder, Note, NoteLink, NoteTag, Project, Tag
+from app.schemas import (
+    FolderResponse,
+    NoteLinkRef,
+    NoteTagRef,
+    ProjectResponse,
+    SyncChanges,
+    TagResponse,
+    Tombstone,
+)
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+S = Annotated[Session, Depends(get_session)]
+
+
+@router.get("/changes", response_model=SyncChanges)
+def get_changes(session: S, since: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=5000)):
+    """Return everything created, updated or hard-deleted after the `since` cursor.
+
+    Pass the returned `cursor` as `since` on the next call; keep calling while
+    `has_more` is true. since=0 performs a full sync.
+    """
+    changes = changes_since(session, since, limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    upserts: dict[str, list[str]] = {}
+    deleted: list[Tombstone] = []
+    for c in changes:
+        if c.op == "delete":
+            deleted.append(Tombstone(entity=c.entity, id=c.entity_id))
+        else:
+            upserts.setdefault(c.entity, []).append(c.entity_id)
+
+    result = SyncChanges(cursor=changes[-1].seq if changes else since, has_more=has_more, deleted=deleted)
+
+    def found(entity: str, requested: list[str], present: set[str]) -> None:
+        # Rows removed later in the same batch window surface as tombstones
+        for key in requested:
+            if key not in present:
+                result.deleted.append(Tombstone(entity=entity, id=key))
+
+    if ids := upserts.get("note"):
+        notes = session.exec(select(Note).where(col(Note.id).in_(ids))).all()
+        result.notes = note_responses(notes, session)
+        found("note", ids, {n.id for n in notes})
+
+    if ids := upserts.get("folder"):
+        folders = session.exec(select(Folder).where(col(Folder.id).in_(ids))).all()
+        counts = note_counts("folder", ids, session)
+        result.folders = [FolderResponse(**f.model_dump(), note_count=counts.get(f.id, 0)) for f in folders]
+        found("folder", ids, {f.id for f in folders})
+
+    if ids := upserts.get("tag"):
+        tags = session.exec(select(Tag).where(col(Tag.id).in_(ids))).all()
+        counts = note_counts("tag", ids, session)
+        result.tags = [TagResponse(**t.model_dump(), note_count=counts.get(t.id, 0)) for t in tags]
+        found("tag", ids, {t.id for t in tags})
+
+    if ids := upserts.get("project"):
+        projects = session.exec(select(Project).where(col(Project.id).in_(ids))).all()
+        counts = note_counts("project", ids, session)
+        result.projects = [ProjectResponse(**p.model_dump(), note_count=counts.get(p.id, 0)) for p in projects]
+        found("project", ids, {p.id for p in projects})
+
+    if keys := upserts.get("note_tag"):
+        note_ids = list({k.split(":")[0] for k in keys})
+        rows = session.exec(select(NoteTag).where(col(NoteTag.note_id).in_(note_ids))).all()
+        present = {f"{r.note_id}:{r.tag_id}" for r in rows}
+        result.note_tags = [NoteTagRef(note_id=k.split(":")[0], tag_id=k.split(":")[1]) for k in keys if k in present]
+        found("note_tag", keys, present)
+
+    if keys := upserts.get("link"):
+        source_ids = list({k.split(":")[0] for k in keys})
+        rows = session.exec(select(NoteLink).where(col(NoteLink.source_id).in_(source_ids))).all()
+        present = {f"{r.source_id}:{r.target_id}" for r in rows}
+        result.links = [NoteLinkRef(source_id=k.split(":")[0], target_id=k.split(":")[1]) for k in keys if k in present]
+        found("link", keys, present)
+
+    return result
@@ -1,10 +1,11 @@
 from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select
 
+from app.counters import note_counts
 from app.database import get_session
-from app.models import Note, NoteTag, Tag, generate_ulid
+from app.models import Tag, generate_ulid
 from app.schemas import TagCreate, TagResponse, TagUpdate
 
 router = APIRouter(prefix="/tags", tags=["tags"])
@@ -19,15 +20,8 @@ def list_tags(session: S, project_id: Optional[str] = None):
     else:
         query = query.where(Tag.project_id == None)  # noqa: E711
     tags = session.exec(query).all()
-    result = []
-    for t in tags:
-        count = session.exec(
-            select(func.count()).select_from(NoteTag).join(Note, NoteTag.note_id == Note.id).where(
-                NoteTag.tag_id == t.id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-            )
-        ).one()
-        result.append(TagResponse(**t.model_dump(), note_count=count))
-    return result
+    counts = note_counts("tag", [t.id for t in tags], session)
+    return [TagResponse(**t.model_dump(), note_count=counts.get(t.id, 0)) for t in tags]
 
 
 @router.get("/{tag_id}", response_model=TagResponse)
@@ -35,11 +29,7 @@ def get_tag(tag_id: str, session: S):
     tag = session.get(Tag, tag_id)
     if not tag:
         raise HTTPException(404, "Tag not found")
-    count = session.exec(
-        select(func.count()).select_from(NoteTag).join(Note, NoteTag.note_id == Note.id).where(
-            NoteTag.tag_id == tag_id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-        )
-    ).one()
+    count = note_counts("tag", [tag_id], session).get(tag_id, 0)
     return TagResponse(**tag.model_dump(), note_count=count)
 
 
@@ -75,11 +65,7 @@ def update_tag(tag_id: str, data: TagUpdate, session: S):
     session.commit()
     session.refresh(tag)
 
-    count = session.exec(
-        select(func.count()).select_from(NoteTag).join(Note, NoteTag.note_id == Note.id).where(
-            NoteTag.tag_id == tag_id, Note.is_trashed == False, Note.is_completed == False  # noqa: E712
-        )
-    ).one()
+    count = note_counts("tag", [tag_id], session).get(tag_id, 0)
     return TagResponse(**tag.model_dump(), note_count=count)
 
 
@@ -69,6 +69,61 @@ class NoteResponse(BaseModel):
     subtask_completed: int = 0
 
 
+class NoteSummary(BaseModel):
+    """NoteResponse without the markdown body, for list/board/calendar views."""
+    id: str
+    title: str
+    preview: str
+    folder_id: Optional[str]
+    position: float
+    is_pinned: bool
+    is_trashed: bool
+    trashed_at: Optional[str]
+    is_completed: bool
+    completed_at: Optional[str]
+    note_type: str
+    is_daily: bool
+    daily_date: Optional[str]
+    due_at: Optional[str]
+    parent_id: Optional[str]
+    status: Optional[str]
+    project_id: Optional[str]
+    recurrence_rule: Optional[RecurrenceRule]
+    recurrence_source_id: Optional[str]
+    created_at: str
+    updated_at: str
+    tags: list[TagBrief] = []
+    subtask_count: int = 0
+    subtask_completed: int = 0
+
+
+class NotePage(BaseModel):
+    items: list[NoteResponse] | list[NoteSummary]
+    next_cursor: Optional[str] = None
+
+
+class BulkOperation(BaseModel):
+    op: Literal["update", "trash", "delete", "restore", "complete", "uncomplete", "add_tag", "remove_tag"]
+    note_id: str
+    tag_id: Optional[str] = None  # add_tag / remove_tag
+    data: Optional[NoteUpdate] = None  # update
+
+
+class BulkRequest(BaseModel):
+    operations: list[BulkOperation]
+
+
+class BulkOpResult(BaseModel):
+    op: str
+    note_id: str
+    ok: bool
+    error: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    results: list[BulkOpResult]
+
+
 # --- Folders ---
 class FolderCreate(BaseModel):
     name: str
@@ -101,6 +156,7 @@ class FolderTree(BaseModel):
     parent_id: Optional[str]
     position: float
     note_count: int = 0
+    total_count: int = 0  # note_count including all descendant folders
     children: list["FolderTree"] = []
 
 
@@ -148,6 +204,13 @@ class ProjectResponse(BaseModel):
     note_count: int = 0
 
 
+# --- Sidebar ---
+class SidebarSnapshot(BaseModel):
+    folders: list[FolderTree]
+    tags: list[TagResponse]
+    projects: list[ProjectResponse]
+
+
 # --- Search ---
 class SearchResult(BaseModel):
     id: str
@@ -158,6 +221,39 @@ class SearchResult(BaseModel):
     parent_id: Optional[str] = None
     parent_title: Optional[str] = None
     rank: float
+    attachment_id: Optional[str] = None  # set when the match is in this attachment's text
+    attachment_name: Optional[str] = None
+
+
+class SearchFacet(BaseModel):
+    id: Optional[str]  # None counts hits without a folder / project
+    name: Optional[str]
+    count: int
+
+
+class SearchFacets(BaseModel):
+    folders: list[SearchFacet]
+    tags: list[SearchFacet]
+    projects: list[SearchFacet]
+
+
+class SearchPage(BaseModel):
+    items: list[SearchResult]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None  # only with facets=true
+    facets: Optional[SearchFacets] = None
+    status: Literal["complete", "partial", "too_broad", "cancelled"] = "complete"
+
+
+class SearchCacheStats(BaseModel):
+    size: int
+    capacity: int
+    generation: Optional[int]
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    invalidations: int
 
 
 # --- Version History ---
@@ -182,10 +278,40 @@ class BacklinkResponse(BaseModel):
     updated_at: str
 
 
+class RelatedNote(BaseModel):
+    id: str
+    title: str
+    score: float  # cosine similarity of TF-IDF vectors, 0..1
+
+
+class DuplicateNote(BaseModel):
+    id: str
+    title: str
+    updated_at: str
+
+
+class DuplicateCluster(BaseModel):
+    notes: list[DuplicateNote]
+    similarity: float  # lowest estimated Jaccard similarity that joined the cluster
+
+
+class TitleMatch(BaseModel):
+    id: str
+    title: str
+    folder_id: Optional[str]
+    folder_name: Optional[str]
+
+
 class GraphNode(BaseModel):
     id: str
     title: str
     folder_id: Optional[str]
+    kind: str = "note"  # "note", or "tag" / "folder" group nodes in mode=groups
+    # Precomputed by app/graph_layout.py; None until it has seen the node
+    x: Optional[float] = None
+    y: Optional[float] = None
+    pagerank: Optional[float] = None
+    component: Optional[int] = None
 
 
 class GraphEdge(BaseModel):
@@ -197,6 +323,17 @@ class GraphEdge(BaseModel):
 class GraphData(BaseModel):
     nodes: list[GraphNode]
     edges: list[GraphEdge]
+    version: Optional[int] = None  # pass as `since` to /graph/changes
+    layout_version: Optional[int] = None  # graph version the x/y/pagerank/component values are from
+
+
+class GraphDiff(BaseModel):
+    version: int
+    reset: bool = False  # too much changed: refetch /graph instead
+    nodes: list[GraphNode] = []  # added or updated
+    removed: list[str] = []  # node ids
+    touched: list[str] = []  # note ids whose edges are all listed in `edges`
+    edges: list[GraphEdge] = []
 
 
 # --- Reminders ---
@@ -252,6 +389,34 @@ class ReorderRequest(BaseModel):
     items: list[ReorderItem]
 
 
+# --- Sync ---
+class NoteTagRef(BaseModel):
+    note_id: str
+    tag_id: str
+
+
+class NoteLinkRef(BaseModel):
+    source_id: str
+    target_id: str
+
+
+class Tombstone(BaseModel):
+    entity: str  # "note", "folder", "tag", "project", "note_tag", "link"
+    id: str  # composite keys are "<a>:<b>"
+
+
+class SyncChanges(BaseModel):
+    cursor: int
+    has_more: bool
+    notes: list[NoteResponse] = []
+    folders: list[FolderResponse] = []
+    tags: list[TagResponse] = []
+    projects: list[ProjectResponse] = []
+    note_tags: list[NoteTagRef] = []
+    links: list[NoteLinkRef] = []
+    deleted: list[Tombstone] = []
+
+
 # --- Finance: Spending ---
 class SpendingCategoryCreate(BaseModel):
     name: str
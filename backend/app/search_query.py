@@ -0,0 +1,89 @@
+"""Parse search input like `deploy tag:work is:task due:<2026-11-01` into SQL.
+
+Recognized `key:value` terms become WHERE clauses over `notes n`; everything
+else is free text for the FTS MATCH. Values may be quoted (`folder:"Side
+projects"`) and terms negated with a leading `-` (`-is:done`). Names match
+case-insensitively.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from fastapi import HTTPException
+
+_TERM_RE = re.compile(r'(-?)(\w+):(?:"([^"]*)"|(\S+))|"([^"]*)"|(\S+)')
+_DUE_RE = re.compile(r"^(<=|>=|<|>|=)?(\d{4}-\d{2}-\d{2})$")
+
+IS_FILTERS = {
+    "task": "n.status IS NOT NULL",
+    "checklist": "n.note_type = 'checklist'",
+    "subtask": "n.parent_id IS NOT NULL",
+    "done": "n.is_completed = 1",
+    "open": "n.is_completed = 0",
+    "pinned": "n.is_pinned = 1",
+    "daily": "n.is_daily = 1",
+    "recurring": "n.recurrence_rule IS NOT NULL",
+}
+
+
+@dataclass
+class ParsedQuery:
+    text: str  # free text left for the FTS MATCH
+    filters: list[str] = field(default_factory=list)  # SQL over `notes n`, ANDed
+    params: dict = field(default_factory=dict)
+
+
+def _due_filter(value: str, p: str, params: dict) -> str:
+    match = _DUE_RE.match(value)
+    if not match:
+        raise HTTPException(400, f"Invalid due date: {value}")
+    op, raw = match.group(1) or "=", match.group(2)
+    try:
+        day = date.fromisoformat(raw)
+    except ValueError:
+        raise HTTPException(400, f"Invalid due date: {value}")
+    # due_at is an ISO timestamp: compare against day boundaries as strings
+    start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    if op == "=":
+        params[f"{p}_from"], params[f"{p}_to"] = start, end
+        return f"n.due_at >= :{p}_from AND n.due_at < :{p}_to"
+    params[p] = {"<": start, "<=": end, ">": end, ">=": start}[op]
+    return f"n.due_at {'<' if op in ('<', '<=') else '>='} :{p}"
+
+
+def parse_query(raw: str) -> ParsedQuery:
+    words: list[str] = []
+    filters: list[str] = []
+    params: dict = {}
+
+    for i, m in enumerate(_TERM_RE.finditer(raw)):
+        negate, key, quoted, bare, phrase, word = m.groups()
+        if key is None or key.lower() not in ("tag", "folder", "project", "is", "status", "due"):
+            words.append(phrase if phrase is not None else m.group(0))
+            continue
+
+        key = key.lower()
+        value = quoted if quoted is not None else bare
+        p = f"f{i}"
+        params[p] = value.lower()
+        if key == "tag":
+            clause = (
+                "EXISTS (SELECT 1 FROM note_tags nt JOIN tags t ON t.id = nt.tag_id"
+                f" WHERE nt.note_id = n.id AND lower(t.name) = :{p})"
+            )
+        elif key == "folder":
+            clause = f"n.folder_id IN (SELECT id FROM folders WHERE lower(name) = :{p})"
+        elif key == "project":
+            clause = f"n.project_id IN (SELECT id FROM projects WHERE lower(name) = :{p})"
+        elif key == "status":
+            clause = f"n.status = :{p}"
+        elif key == "is":
+            if params.pop(p) not in IS_FILTERS:
+                raise HTTPException(400, f"Unknown filter is:{value} (expected one of {', '.join(IS_FILTERS)})")
+            clause = IS_FILTERS[value.lower()]
+        else:
+            params.pop(p)
+            clause = _due_filter(value, p, params)
+        filters.append(f"NOT ({clause})" if negate else f"({clause})")
+
+    return ParsedQuery(text=" ".join(words), filters=filters, params=params)
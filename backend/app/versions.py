@@ -0,0 +1,302 @@
+"""Delta-compressed storage for note version history.
+
+Each note's versions form chains: a compressed full keyframe followed by up to
+KEYFRAME_INTERVAL - 1 versions that store only a zlib-compressed line diff
+against their predecessor (`base_id`). Rows written before delta storage keep
+their full text in `content` (delta IS NULL) and act as keyframes.
+
+Snapshots taken within VERSION_COALESCE_SECONDS of the previous one are folded
+into it, and a background pruner thins old versions to the VERSION_RETENTION
+tiers (default: everything for a day, hourly for a week, daily after that).
+"""
+import asyncio
+import difflib
+import json
+import logging
+import os
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, text, update
+from sqlmodel import Session, col, select
+
+from app.database import engine
+from app.models import NoteVersion, generate_ulid
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_INTERVAL = 20
+
+VERSION_COALESCE_SECONDS = int(os.getenv("VERSION_COALESCE_SECONDS", "300"))
+# "<max age>=<keep one per>" tiers, oldest last; "all" keeps every version, "*" is any age
+VERSION_RETENTION = os.getenv("VERSION_RETENTION", "1d=all,7d=1h,*=1d")
+PRUNE_INTERVAL_SECONDS = int(os.getenv("VERSION_PRUNE_INTERVAL_SECONDS", "3600"))
+PRUNE_BATCH_NOTES = 20
+
+# Edit script opcodes, applied to the base's lines in order
+COPY, INSERT, SKIP = 0, 1, 2
+
+
+def _compress(obj) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode(), 6)
+
+
+def _decompress(blob: bytes):
+    return json.loads(zlib.decompress(blob))
+
+
+def diff(base: str, new: str) -> list:
+    """Line-based edit script turning `base` into `new`."""
+    a = base.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    ops: list = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            ops.append([COPY, i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append([SKIP, i2 - i1])
+        if j2 > j1:
+            ops.append([INSERT, "".join(b[j1:j2])])
+    return ops
+
+
+def patch(base: str, ops: list) -> str:
+    lines = base.splitlines(keepends=True)
+    pos = 0
+    out: list[str] = []
+    for op, arg in ops:
+        if op == COPY:
+            out.extend(lines[pos:pos + arg])
+            pos += arg
+        elif op == SKIP:
+            pos += arg
+        else:
+            out.append(arg)
+    return "".join(out)
+
+
+def version_content(version: NoteVersion, session: Session) -> str:
+    """Rebuild a version's full content from its keyframe and deltas."""
+    if version.delta is None:
+        return version.content
+    if version.base_id is None:
+        return _decompress(version.delta)
+
+    # Walk base_id back to the keyframe in one query, then replay forward
+    rows = session.exec(
+        text("""
+            WITH RECURSIVE chain(id, base_id, content, delta, step) AS (
+                SELECT id, base_id, content, delta, 0 FROM note_versions WHERE id = :id
+                UNION ALL
+                SELECT v.id, v.base_id, v.content, v.delta, c.step + 1
+                FROM note_versions v JOIN chain c ON v.id = c.base_id
+            )
+            SELECT base_id, content, delta FROM chain ORDER BY step DESC
+        """).bindparams(id=version.id)
+    ).all()
+    _, content, delta = rows[0]
+    if delta is not None:
+        content = _decompress(delta)
+    for _, _, delta in rows[1:]:
+        content = patch(content, _decompress(delta))
+    return content
+
+
+def encode_version(
+    note_id: str, title: str, content: str, prev: Optional[NoteVersion], prev_content: Optional[str]
+) -> NoteVersion:
+    """Build (but don't add) a version row, as a delta against `prev` when worthwhile."""
+    keyframe = _compress(content)
+    if prev is not None and prev_content is not None and prev.depth + 1 < KEYFRAME_INTERVAL:
+        delta = _compress(diff(prev_content, content))
+        if len(delta) < len(keyframe):
+            return NoteVersion(
+                id=generate_ulid(), note_id=note_id, title=title, content="",
+                base_id=prev.id, delta=delta, depth=prev.depth + 1,
+            )
+    return NoteVersion(id=generate_ulid(), note_id=note_id, title=title, content="", delta=keyframe, depth=0)
+
+
+def latest_version(note_id: str, session: Session) -> Optional[NoteVersion]:
+    return session.exec(
+        select(NoteVersion)
+        .where(NoteVersion.note_id == note_id)
+        .order_by(col(NoteVersion.created_at).desc(), col(NoteVersion.id).desc())
+        .limit(1)
+    ).first()
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _format_ts(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def snapshot(note_id: str, title: str, content: str, session: Session, coalesce: bool = True) -> NoteVersion:
+    """Record a version of a note's title/content (no commit).
+
+    With `coalesce`, a snapshot within VERSION_COALESCE_SECONDS of the previous
+    one is skipped: the earlier version already holds the state from before this
+    burst of autosaves.
+    """
+    prev = latest_version(note_id, session)
+    if coalesce and prev is not None:
+        age = datetime.now(timezone.utc) - _parse_ts(prev.created_at)
+        if age.total_seconds() < VERSION_COALESCE_SECONDS:
+            return prev
+    prev_content = version_content(prev, session) if prev is not None else None
+    version = encode_version(note_id, title, content, prev, prev_content)
+    session.add(version)
+    return version
+
+
+# --- Retention ---
+
+_DURATION_RE = re.compile(r"^(\d+)([smhdw])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _parse_duration(value: str) -> float:
+    match = _DURATION_RE.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r}")
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def parse_retention(spec: str) -> list[tuple[float, float]]:
+    """Parse "1d=all,7d=1h,*=1d" into [(max_age_s, bucket_s), ...]; bucket 0 keeps all."""
+    tiers = []
+    for part in spec.split(","):
+        age, _, keep = part.partition("=")
+        max_age = float("inf") if age.strip() == "*" else _parse_duration(age)
+        bucket = 0 if keep.strip() == "all" else _parse_duration(keep)
+        tiers.append((max_age, bucket))
+    return sorted(tiers)
+
+
+RETENTION_TIERS = parse_retention(VERSION_RETENTION)
+
+
+def versions_to_drop(versions: list[NoteVersion], now: datetime) -> set[str]:
+    """Ids to delete so each tier keeps only the newest version per bucket."""
+    seen: set[tuple[int, int]] = set()
+    drop: set[str] = set()
+    for v in sorted(versions, key=lambda v: (v.created_at, v.id), reverse=True):
+        created = _parse_ts(v.created_at)
+        age = (now - created).total_seconds()
+        for tier, (max_age, bucket) in enumerate(RETENTION_TIERS):
+            if age < max_age:
+                break
+        else:
+            drop.add(v.id)  # older than every tier
+            continue
+        if bucket == 0:
+            continue
+        key = (tier, int(created.timestamp() // bucket))
+        if key in seen:
+            drop.add(v.id)
+        else:
+            seen.add(key)
+    return drop
+
+
+def _prune_note(note_id: str, session: Session, now: datetime) -> int:
+    versions = session.exec(
+        select(NoteVersion)
+        .where(NoteVersion.note_id == note_id)
+        .order_by(col(NoteVersion.created_at), col(NoteVersion.id))
+    ).all()
+    drop = versions_to_drop(list(versions), now)
+    if not drop:
+        return 0
+
+    # Rebuild every version in order, then re-encode the survivors after the
+    # first dropped one so no delta references a deleted base.
+    contents: dict[str, str] = {}
+    for v in versions:
+        if v.delta is None:
+            contents[v.id] = v.content
+        elif v.base_id is None:
+            contents[v.id] = _decompress(v.delta)
+        elif v.base_id in contents:
+            contents[v.id] = patch(contents[v.base_id], _decompress(v.delta))
+        else:
+            contents[v.id] = version_content(v, session)
+
+    prev: Optional[NoteVersion] = None
+    rewriting = False
+    for v in versions:
+        if v.id in drop:
+            rewriting = True
+            continue
+        if rewriting:
+            encoded = encode_version(note_id, v.title, contents[v.id], prev, contents[prev.id] if prev else None)
+            session.exec(
+                update(NoteVersion)
+                .where(NoteVersion.id == v.id)
+                .values(content="", base_id=encoded.base_id, delta=encoded.delta, depth=encoded.depth)
+            )
+            v.base_id, v.depth = encoded.base_id, encoded.depth
+        prev = v
+
+    session.exec(delete(NoteVersion).where(col(NoteVersion.id).in_(list(drop))))
+    return len(drop)
+
+
+def prune_versions(session: Session, after: str = "", batch: int = PRUNE_BATCH_NOTES) -> Optional[str]:
+    """Apply retention to the next `batch` notes after `after` and commit.
+
+    Returns the last note id handled, or None when there is nothing left.
+    """
+    now = datetime.now(timezone.utc)
+    # Versions inside a leading keep-everything tier are never candidates
+    max_age, bucket = RETENTION_TIERS[0]
+    keep_all = timedelta(seconds=max_age if bucket == 0 and max_age != float("inf") else 0)
+    if bucket == 0 and max_age == float("inf"):
+        return None
+    cutoff = _format_ts(now - keep_all)
+    note_ids = session.exec(
+        text(
+            "SELECT note_id FROM note_versions"
+            " WHERE created_at < :cutoff AND note_id > :after"
+            " GROUP BY note_id ORDER BY note_id LIMIT :batch"
+        ).bindparams(cutoff=cutoff, after=after, batch=batch)
+    ).all()
+    if not note_ids:
+        return None
+
+    # Versions of notes that no longer exist are dropped outright
+    ids = [r[0] for r in note_ids]
+    session.exec(text(
+        "DELETE FROM note_versions WHERE note_id IN (SELECT value FROM json_each(:ids))"
+        " AND note_id NOT IN (SELECT id FROM notes)"
+    ).bindparams(ids=json.dumps(ids)))
+
+    removed = sum(_prune_note(note_id, session, now) for note_id in ids)
+    session.commit()
+    if removed:
+        logger.info("Pruned %d note versions", removed)
+    return ids[-1]
+
+
+async def run_pruner() -> None:
+    """Periodically thin old versions, a few notes per short write transaction."""
+    while True:
+        after: Optional[str] = ""
+        try:
+            while after is not None:
+                after = await asyncio.to_thread(_prune_step, after)
+                await asyncio.sleep(0.05)  # let queued writers take the lock
+        except Exception:
+            logger.exception("Version pruning failed")
+        await asyncio.sleep(PRUNE_INTERVAL_SECONDS)
+
+
+def _prune_step(after: str) -> Optional[str]:
+    with Session(engine) as session:
+        return prune_versions(session, after)
@@ -48,6 +48,7 @@ export interface FolderResponse {
 }
 
 export interface FolderTree extends FolderResponse {
+  total_count: number;
   children: FolderTree[];
 }
 
@@ -60,6 +61,12 @@ export interface TagResponse {
   note_count: number;
 }
 
+export interface SidebarSnapshot {
+  folders: FolderTree[];
+  tags: TagResponse[];
+  projects: ProjectResponse[];
+}
+
 export interface SearchResult {
   id: string;
   title: string;
@@ -69,6 +76,28 @@ export interface SearchResult {
   parent_id: string | null;
   parent_title: string | null;
   rank: number;
+  attachment_id: string | null;
+  attachment_name: string | null;
+}
+
+export interface SearchFacet {
+  id: string | null;
+  name: string | null;
+  count: number;
+}
+
+export interface SearchFacets {
+  folders: SearchFacet[];
+  tags: SearchFacet[];
+  projects: SearchFacet[];
+}
+
+export interface SearchPage {
+  items: SearchResult[];
+  next_cursor: string | null;
+  total: number | null;
+  facets: SearchFacets | null;
+  status: 'complete' | 'partial' | 'too_broad' | 'cancelled';
 }
 
 export interface NoteVersionBrief {
@@ -91,10 +120,33 @@ export interface BacklinkResponse {
   updated_at: string;
 }
 
+export interface DuplicateCluster {
+  notes: { id: string; title: string; updated_at: string }[];
+  similarity: number;
+}
+
+export interface RelatedNote {
+  id: string;
+  title: string;
+  score: number;
+}
+
+export interface TitleMatch {
+  id: string;
+  title: string;
+  folder_id: string | null;
+  folder_name: string | null;
+}
+
 export interface GraphNode {
   id: string;
   title: string;
   folder_id: string | null;
+  kind: 'note' | 'tag' | 'folder';
+  x: number | null;
+  y: number | null;
+  pagerank: number | null;
+  component: number | null;
 }
 
 export interface GraphEdge {
@@ -116,6 +168,35 @@ export interface ProjectResponse {
 export interface GraphData {
   nodes: GraphNode[];
   edges: GraphEdge[];
+  version: number | null;
+  layout_version: number | null;
+}
+
+/** Decoded application/vnd.every-note.graph body: node columns plus edge index arrays. */
+export interface GraphColumns {
+  version: number | null;
+  ids: string[];
+  titles: string[];
+  folderIds: (string | null)[];
+  kinds: string[];
+  x: (number | null)[];
+  y: (number | null)[];
+  pagerank: (number | null)[];
+  component: (number | null)[];
+  layoutVersion: number | null;
+  edgeTypes: GraphEdge['type'][];
+  sources: Uint32Array;
+  targets: Uint32Array;
+  types: Uint8Array;
+}
+
+export interface GraphDiff {
+  version: number;
+  reset: boolean;
+  nodes: GraphNode[];
+  removed: string[];
+  touched: string[];
+  edges: GraphEdge[];
 }
 
 export interface ReminderResponse {